@@ -1,13 +1,15 @@
 from pathlib import Path
 
-import toml
-
 root = Path(__file__).parent
 
-try:
-    with open(root / 'custom_config.toml') as f:
+custom_config_path = root / 'custom_config.toml'
+if custom_config_path.exists():
+    # toml is only imported when there is something to read
+    import toml
+
+    with open(custom_config_path) as f:
         cc = toml.load(f)
-except FileNotFoundError:
+else:
     cc = {}
 
 solve_output_enabled = cc.get('solve_output_enabled', True)
@@ -0,0 +1,68 @@
+import random
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, TextIO, TypeVar, Union
+
+T = TypeVar('T')
+Source = Union[str, Path, TextIO]
+
+# Batch files with this suffix are in the packed binary format, see `models.packed_batch`
+packed_suffix = '.sdkb'
+
+
+def is_packed_path(source: Source) -> bool:
+    return isinstance(source, (str, Path)) and Path(source).suffix == packed_suffix
+
+
+def read_puzzle_strings(source: Source) -> Iterator[str]:
+    """Lazily read puzzle strings, one per line.
+
+    Only one line is held in memory at a time, empty lines are skipped.
+    Packed batch files are recognized by their suffix and read in chunks of records.
+
+    :param source: path to a batch file, an open text stream or `-` for stdin
+    :return: iterator over stripped puzzle strings
+    """
+    if source == '-':
+        yield from _iter_stripped_lines(sys.stdin)
+    elif hasattr(source, 'read'):
+        yield from _iter_stripped_lines(source)
+    elif is_packed_path(source):
+        from models.packed_batch import PackedBatch
+        with PackedBatch(source) as batch:
+            yield from batch
+    else:
+        with open(source) as f:
+            yield from _iter_stripped_lines(f)
+
+
+def _iter_stripped_lines(stream: TextIO) -> Iterator[str]:
+    for line in stream:
+        if line := line.strip():
+            yield line
+
+
+def iter_chunks(items: Iterable[T], chunk_size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def write_line(sink: Optional[TextIO], line: str, flush: bool = False):
+    # Buffering is left to the stream. `flush` is for interactive use, where downstream consumers
+    # should see every line as soon as it's ready, at the price of a write per line.
+    if sink is not None:
+        sink.write(line + '\n')
+        if flush:
+            sink.flush()
+
+
+def sample_puzzle_string(puzzle_strings: Iterable[str]) -> Optional[str]:
+    # Reservoir sampling, picks a uniformly random line in a single pass
+    chosen = None
+    for i, puzzle_string in enumerate(puzzle_strings):
+        if random.randrange(i + 1) == 0:
+            chosen = puzzle_string
+
+    return chosen
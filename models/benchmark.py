@@ -0,0 +1,195 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import config as cfg
+from models.batch_io import read_puzzle_strings
+from models.puzzle import Puzzle
+from models.sudoku_solver import SudokuSolver
+
+BenchResult = Dict[str, object]
+
+default_baseline_path = cfg.root / 'benchmarks/baseline.json'
+
+
+def get_default_batch_files() -> List[str]:
+    # Everything in the batches folder except solver outputs
+    return sorted(file.name for file in SudokuSolver.batches_path.glob('*.txt')
+                  if not file.name.startswith(('unsolved_', 'results')))
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    # Linear interpolation between closest ranks, `q` is between 0 and 100
+    if not sorted_values:
+        return 0.0
+
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def get_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cfg.root,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return output.stdout.strip()
+
+
+def time_puzzles(solver: SudokuSolver, puzzle_strings: Sequence[str]) -> Tuple[List[float], int]:
+    # Latency of every puzzle in seconds and the number of unsolved ones
+    latencies = []
+    unsolved = 0
+    for puzzle_string in puzzle_strings:
+        time_start = time.perf_counter()
+        is_solved = solver.solve(Puzzle.from_string(puzzle_string))
+        latencies.append(time.perf_counter() - time_start)
+        unsolved += not is_solved
+
+    return latencies, unsolved
+
+
+def bench_file(solver: SudokuSolver, filename: str,
+               repeats: int = 3,
+               warmup: int = 100,
+               limit: Optional[int] = None) -> BenchResult:
+    """Benchmark one batch file.
+
+    The first `warmup` puzzles are solved once untimed, so that caches and lazily built
+    tables are in place. Then the whole file (or the first `limit` puzzles) is solved
+    `repeats` times, timing every puzzle separately.
+
+    :return: counts, throughput and per-puzzle latency percentiles in milliseconds
+    """
+    puzzle_strings = list(islice(read_puzzle_strings(solver.batches_path / filename), limit))
+    time_puzzles(solver, puzzle_strings[:warmup])
+    solver.reset_tech_stats()
+
+    runs = []
+    all_latencies = []
+    unsolved = 0
+    for _ in range(repeats):
+        solver.bruteforce_counter = 0
+        latencies, unsolved = time_puzzles(solver, puzzle_strings)
+        solver.reset_tech_stats()
+        total_time = sum(latencies)
+        runs.append({'total_s': total_time, 'puzzles_per_s': len(latencies) / total_time if total_time else 0.0})
+        all_latencies.extend(latencies)
+
+    all_latencies.sort()
+    return {
+        'count': len(puzzle_strings),
+        'unsolved': unsolved,
+        'bruteforce': solver.bruteforce_counter,
+        'puzzles_per_s': statistics.median(run['puzzles_per_s'] for run in runs),
+        'latency_ms': {name: percentile(all_latencies, q) * 1000
+                       for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+        'mean_ms': statistics.fmean(all_latencies) * 1000 if all_latencies else 0.0,
+        'runs': runs,
+    }
+
+
+def run_benchmark(files: Optional[Sequence[str]] = None,
+                  search_mode: str = 'copy',
+                  repeats: int = 3,
+                  warmup: int = 100,
+                  limit: Optional[int] = None) -> BenchResult:
+    if files is None:
+        files = get_default_batch_files()
+
+    previous_output = cfg.solve_output_enabled
+    cfg.solve_output_enabled = False
+    solver = SudokuSolver(search_mode)
+    try:
+        results = {filename: bench_file(solver, filename, repeats=repeats, warmup=warmup, limit=limit)
+                   for filename in files}
+    finally:
+        cfg.solve_output_enabled = previous_output
+
+    return {
+        'meta': {
+            'commit': get_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'search_mode': search_mode,
+            'repeats': repeats,
+            'warmup': warmup,
+            'limit': limit,
+        },
+        'files': results,
+    }
+
+
+def compare_with_baseline(current: BenchResult, baseline: BenchResult, threshold: float = 0.05) -> List[str]:
+    """Find files whose throughput dropped by more than `threshold` compared to the baseline.
+
+    Files missing from either side are skipped. Different unsolved counts are reported too.
+
+    :return: human-readable description of every regression, empty if there are none
+    """
+    regressions = []
+    for filename, result in current['files'].items():
+        base = baseline['files'].get(filename)
+        if base is None:
+            continue
+
+        ratio = result['puzzles_per_s'] / base['puzzles_per_s'] if base['puzzles_per_s'] else 1.0
+        if ratio < 1 - threshold:
+            regressions.append(f"{filename}: {result['puzzles_per_s']:.1f} puzzles/s vs "
+                               f"{base['puzzles_per_s']:.1f} in baseline ({ratio - 1:+.1%})")
+
+        if result['unsolved'] != base['unsolved']:
+            regressions.append(f"{filename}: {result['unsolved']} unsolved vs {base['unsolved']} in baseline")
+
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the solver over puzzle batch files')
+    parser.add_argument('files', nargs='*', help='batch files in puzzles/batches, all of them by default')
+    parser.add_argument('--search-mode', default='copy', choices=SudokuSolver.search_modes)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=100, help='puzzles solved untimed before measuring')
+    parser.add_argument('--limit', type=int, help='only use the first N puzzles of each file')
+    parser.add_argument('--output', type=Path, help='write JSON results here instead of stdout')
+    parser.add_argument('--baseline', type=Path, help=f'compare against this JSON, e.g. {default_baseline_path}')
+    parser.add_argument('--threshold', type=float, default=0.05, help='allowed throughput drop, 0.05 is 5%%')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as the new baseline')
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.files or None, search_mode=args.search_mode, repeats=args.repeats,
+                           warmup=args.warmup, limit=args.limit)
+    output = json.dumps(result, indent=2)
+
+    if args.output:
+        args.output.write_text(output + '\n')
+    else:
+        print(output)
+
+    if args.save_baseline:
+        baseline_path = args.baseline or default_baseline_path
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(output + '\n')
+        return 0
+
+    if args.baseline:
+        regressions = compare_with_baseline(result, json.loads(args.baseline.read_text()), args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+from typing import Iterable, Iterator
+
+# Candidates of a cell are stored as a single int: bit k is set when digit k + 1 is a candidate.
+Mask = int
+
+
+def value_to_bit(value: int) -> Mask:
+    return 1 << (value - 1)
+
+
+def bit_to_value(bit: Mask) -> int:
+    # Expects a mask with exactly one bit set
+    return bit.bit_length()
+
+
+def full_mask(size: int) -> Mask:
+    return (1 << size) - 1
+
+
+def popcount(mask: Mask) -> int:
+    return mask.bit_count()
+
+
+def lowest_bit(mask: Mask) -> Mask:
+    return mask & -mask
+
+
+def lowest_value(mask: Mask) -> int:
+    return (mask & -mask).bit_length()
+
+
+def mask_union(masks: Iterable[Mask]) -> Mask:
+    result = 0
+    for mask in masks:
+        result |= mask
+
+    return result
+
+
+def values_to_mask(values: Iterable[int]) -> Mask:
+    result = 0
+    for value in values:
+        if value:
+            result |= 1 << (value - 1)
+
+    return result
+
+
+def iter_bits(mask: Mask) -> Iterator[Mask]:
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+def iter_values(mask: Mask) -> Iterator[int]:
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length()
+        mask ^= bit
+
+
+def iter_indices(mask: Mask) -> Iterator[int]:
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length() - 1
+        mask ^= bit
@@ -0,0 +1,143 @@
+from functools import lru_cache
+from itertools import permutations
+from math import isqrt
+from operator import itemgetter
+from typing import Dict, List, Sequence, Tuple
+
+from models.encoding import grid_to_symbols
+
+# Target cell -> source cell
+CellPermutation = Tuple[int, ...]
+
+
+@lru_cache
+def get_transforms(size: int) -> Tuple[CellPermutation, ...]:
+    """All grid symmetries used for canonical forms: band swaps, stack swaps and transposition.
+
+    For 9x9 that is 3! * 3! * 2 = 72 cell permutations. Built once per size.
+    """
+    box_size = isqrt(size)
+    result = set()
+    for transpose in (False, True):
+        for band_order in permutations(range(box_size)):
+            for stack_order in permutations(range(box_size)):
+                rows = [band * box_size + i for band in band_order for i in range(box_size)]
+                columns = [stack * box_size + i for stack in stack_order for i in range(box_size)]
+                if transpose:
+                    result.add(tuple(columns[x] * size + rows[y] for y in range(size) for x in range(size)))
+                else:
+                    result.add(tuple(rows[y] * size + columns[x] for y in range(size) for x in range(size)))
+
+    return tuple(sorted(result))
+
+
+@lru_cache
+def get_first_rows(size: int) -> Tuple[Tuple[Tuple[int, ...], Tuple[CellPermutation, ...]], ...]:
+    # Transforms grouped by the source cells of their first row, half of them share it with another one
+    groups: Dict[Tuple[int, ...], List[CellPermutation]] = {}
+    for permutation in get_transforms(size):
+        groups.setdefault(permutation[:size], []).append(permutation)
+
+    return tuple((sources, tuple(group)) for sources, group in groups.items())
+
+
+class CanonicalForm:
+    def __init__(self, key: str, permutation: CellPermutation, digit_map: Dict[int, int]):
+        """Canonical representative of a puzzle and the transform that leads to it.
+
+        Two puzzles that differ only by digit relabeling, band/stack swaps and transposition
+        share the same key. `permutation` and `digit_map` (original digit -> canonical digit)
+        map grids of this puzzle to the canonical frame and back.
+        """
+        self.key = key
+        self.permutation = permutation
+        self.digit_map = digit_map
+        self.inverse_digit_map = {canonical: digit for digit, canonical in digit_map.items()}
+
+    def to_canonical(self, grid: List[int]) -> List[int]:
+        digit_map = self.digit_map
+        return [digit_map.get(grid[source], 0) for source in self.permutation]
+
+    def from_canonical(self, canonical_grid: List[int]) -> List[int]:
+        inverse_digit_map = self.inverse_digit_map
+        grid = [0] * len(canonical_grid)
+        for target, source in enumerate(self.permutation):
+            grid[source] = inverse_digit_map.get(canonical_grid[target], 0)
+
+        return grid
+
+
+def identity_form(grid: List[int], size: int) -> CanonicalForm:
+    # The puzzle itself as its own canonical form, for when searching all transforms is too costly
+    return CanonicalForm(grid_to_symbols(grid), tuple(range(size * size)),
+                         {digit: digit for digit in range(1, size + 1)})
+
+
+def relabel_row(grid: List[int], sources: Sequence[int], labels: Dict[int, int]) -> Tuple[List[int], Dict[int, int]]:
+    # Values of the source cells with digits relabeled in order of first appearance, `labels` is extended in place
+    row = []
+    for source in sources:
+        value = grid[source]
+        if value:
+            label = labels.get(value)
+            if label is None:
+                label = labels[value] = len(labels) + 1
+            value = label
+        row.append(value)
+
+    return row, labels
+
+
+def canonicalize(grid: List[int], size: int) -> CanonicalForm:
+    """Find the canonical form of a grid.
+
+    Every transform from `get_transforms` is applied, then digits are relabeled in order
+    of first appearance. The lexicographically smallest result is the key.
+
+    Relabeling a prefix of the permuted grid doesn't depend on what comes after it, so the
+    key is built row by row, and after each row only the transforms with the smallest rows
+    so far are kept. Usually a couple of rows leave a single transform, so most of the
+    grid is only ever permuted once.
+
+    :param grid: flat grid of cell values, 0 for unknown cells
+    :param size: width and height of the grid
+    :return: the key together with the transform that produced it
+    """
+    # The first row only depends on its source cells, so it is relabeled once for transforms that share them
+    best_row = None
+    best_groups = []
+    for sources, group in get_first_rows(size):
+        row, labels = relabel_row(grid, sources, {})
+        if best_row is None or row < best_row:
+            best_row = row
+            best_groups = [(group, labels)]
+        elif row == best_row:
+            best_groups.append((group, labels))
+
+    # Every transform still in the running with its digit relabeling so far, in the order of `get_transforms`
+    survivors = sorted(((permutation, labels.copy()) for group, labels in best_groups for permutation in group),
+                       key=itemgetter(0))
+    key_values = best_row
+    for start in range(size, size * size, size):
+        best_row = None
+        next_survivors = []
+        for permutation, labels in survivors:
+            row, labels = relabel_row(grid, permutation[start:start + size], labels)
+            if best_row is None or row < best_row:
+                best_row = row
+                next_survivors = [(permutation, labels)]
+            elif row == best_row:
+                next_survivors.append((permutation, labels))
+
+        survivors = next_survivors
+        key_values += best_row
+
+    # Ties lead to the same key, the first transform in order is taken
+    best_permutation, digit_map = survivors[0]
+    # Digits missing from the puzzle get the remaining labels in ascending order,
+    # any assignment is fine since the puzzle doesn't tell them apart
+    unused_digits = [digit for digit in range(1, size + 1) if digit not in digit_map]
+    for i, digit in enumerate(unused_digits, len(digit_map) + 1):
+        digit_map[digit] = i
+
+    return CanonicalForm(grid_to_symbols(key_values), best_permutation, digit_map)
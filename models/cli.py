@@ -0,0 +1,152 @@
+"""Command line entry point, run it as `python -m models <command>`.
+
+Only argparse is imported up front. Every command imports what it needs when it runs,
+so that short-lived processes don't pay for modes they don't use.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Optional, Sequence
+
+cli_start = time.perf_counter()
+
+
+def report_startup(args: argparse.Namespace):
+    # Called by commands once their imports are done, right before the actual work
+    if args.timing:
+        print(f'startup: {(time.perf_counter() - cli_start) * 1000:.1f}ms since the CLI was loaded, '
+              f'{time.process_time() * 1000:.1f}ms CPU since the process started', file=sys.stderr)
+
+
+def get_policy(args: argparse.Namespace):
+    from models.scheduler import policies
+
+    return policies[args.policy]()
+
+
+def solve_command(args: argparse.Namespace) -> int:
+    import config as cfg
+    from models.puzzle import Puzzle
+    from models.sudoku_solver import SudokuSolver
+
+    tracer = None
+    if args.quiet:
+        cfg.solve_output_enabled = False
+    elif args.jsonl:
+        from models.trace import JsonlTracer
+        cfg.solve_output_enabled = False
+        tracer = JsonlTracer(sys.stdout)
+
+    if args.file:
+        puzzle = Puzzle.from_file(args.puzzle)
+        if puzzle is None:
+            return 1
+    else:
+        puzzle = Puzzle.from_string(args.puzzle)
+
+    solver = SudokuSolver(args.search_mode, tracer=tracer, policy=get_policy(args))
+    report_startup(args)
+    is_solved = solver.solve(puzzle)
+    if not args.jsonl:
+        print(puzzle.get_puzzle_string())
+    return 0 if is_solved else 1
+
+
+def batch_command(args: argparse.Namespace) -> int:
+    from models.stats import StatsCollector
+    from models.sudoku_solver import SudokuSolver
+
+    stats = StatsCollector() if args.stats else None
+    solver = SudokuSolver(args.search_mode, stats, policy=get_policy(args))
+    report_startup(args)
+    for filename in args.files:
+        solver.batch_solve(filename, save_results=args.save_results, results_filename=args.results_filename,
+                           save_unsolved=args.save_unsolved, workers=args.workers, vectorized=args.vectorized)
+    return 0
+
+
+def random_command(args: argparse.Namespace) -> int:
+    from models.sudoku_solver import SudokuSolver
+
+    solver = SudokuSolver(args.search_mode, policy=get_policy(args))
+    report_startup(args)
+    solver.solve_random_from_batch(args.file)
+    return 0
+
+
+def bench_command(args: argparse.Namespace) -> int:
+    from models import benchmark
+
+    report_startup(args)
+    return benchmark.main(args.bench_args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m models', description='Sudoku solver')
+    parser.add_argument('--timing', action='store_true', help='report startup time to stderr')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    # Same as `SudokuSolver.search_modes`, spelled out so that parsing doesn't import the solver
+    search_modes = ('copy', 'trail', 'dlx')
+    # Same for `models.scheduler.policies`
+    policies = ('fixed', 'adaptive')
+
+    solve_parser = subparsers.add_parser('solve', help='solve one puzzle and print its final state')
+    solve_parser.add_argument('puzzle', help='puzzle string, or a file in the puzzles folder with --file')
+    solve_parser.add_argument('--file', action='store_true', help='read the puzzle from a file')
+    solve_parser.add_argument('--search-mode', default='copy', choices=search_modes)
+    solve_parser.add_argument('--policy', default='fixed', choices=policies, help='order of the techniques')
+    output = solve_parser.add_mutually_exclusive_group()
+    output.add_argument('-q', '--quiet', action='store_true', help='no step-by-step output')
+    output.add_argument('--jsonl', action='store_true', help='steps as JSON lines instead of text')
+    solve_parser.set_defaults(handler=solve_command)
+
+    batch_parser = subparsers.add_parser('batch', help='solve batch files and report totals')
+    batch_parser.add_argument('files', nargs='+', help='batch files in puzzles/batches')
+    batch_parser.add_argument('--search-mode', default='copy', choices=search_modes)
+    batch_parser.add_argument('--policy', default='fixed', choices=policies, help='order of the techniques')
+    batch_parser.add_argument('--workers', type=int, default=1)
+    batch_parser.add_argument('--vectorized', action='store_true', help='use the numpy batch engine first')
+    batch_parser.add_argument('--stats', action='store_true',
+                              help='measure every technique for the report, slows solving down')
+    batch_parser.add_argument('--save-results', action='store_true')
+    batch_parser.add_argument('--results-filename')
+    batch_parser.add_argument('--save-unsolved', action='store_true')
+    batch_parser.set_defaults(handler=batch_command)
+
+    random_parser = subparsers.add_parser('random', help='solve a random puzzle from a batch file')
+    random_parser.add_argument('file', help='batch file in puzzles/batches')
+    random_parser.add_argument('--search-mode', default='copy', choices=search_modes)
+    random_parser.add_argument('--policy', default='fixed', choices=policies, help='order of the techniques')
+    random_parser.set_defaults(handler=random_command)
+
+    # Arguments after `bench` are split off in `main` and go to the benchmark's own parser
+    bench_parser = subparsers.add_parser('bench', help='benchmark batch files, see models/benchmark.py',
+                                         add_help=False)
+    bench_parser.set_defaults(handler=bench_command, bench_args=[])
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Global options take no values, so the command is the first argument that isn't one.
+    # `bench` passes everything after it on untouched, options and --help included.
+    command_index = next((i for i, arg in enumerate(argv) if not arg.startswith('-')), len(argv))
+    if argv[command_index:command_index + 1] == ['bench']:
+        args = build_parser().parse_args(argv[:command_index + 1])
+        args.bench_args = argv[command_index + 1:]
+    else:
+        args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # Whoever reads the output went away, e.g. `| head`. Point stdout at devnull so that
+        # flushing it at exit doesn't fail again, and quit without a traceback.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+from typing import Dict, List
+
+# One character per cell value in puzzle strings: `0` for unknown cells, `1`-`9` and then `A`-`P`
+# for 10-25. Every supported size fits, and 9x9 strings stay plain digits.
+symbols = '0123456789ABCDEFGHIJKLMNOP'
+
+# Character -> cell value. Lowercase letters are accepted too, and `.` as an unknown cell.
+symbol_values: Dict[str, int] = {**{char: value for value, char in enumerate(symbols)},
+                                 **{char.lower(): value for value, char in enumerate(symbols) if char.isalpha()},
+                                 '.': 0}
+
+
+def grid_to_symbols(grid: List[int]) -> str:
+    return ''.join(map(symbols.__getitem__, grid))
+
+
+def symbols_to_grid(string: str) -> List[int]:
+    try:
+        return [symbol_values[char] for char in string]
+    except KeyError as e:
+        raise ValueError(f'Invalid puzzle string: unknown character {e.args[0]!r}') from None
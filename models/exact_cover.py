@@ -0,0 +1,149 @@
+from typing import Dict, Iterator, List, Optional, Set
+
+from models.bitmask import iter_values
+from models.puzzle import Puzzle
+
+# Exact cover matrix stored sparsely: constraint -> rows covering it, and row -> constraints it covers.
+# Rows are (cell, value) choices encoded as `cell * size + value - 1`.
+Columns = Dict[int, Set[int]]
+Rows = Dict[int, List[int]]
+
+
+class ExactCover:
+    def __init__(self, puzzle: Puzzle):
+        """Algorithm X over the exact cover form of a puzzle.
+
+        Every (cell, value) choice is a row that covers four constraints: the cell is filled,
+        and the value is present in its row, column and box. A solution picks rows so that
+        every constraint is covered exactly once. The matrix is kept as dicts of sets, which
+        is the Python-friendly equivalent of dancing links: covering and uncovering a column
+        moves its rows out of and back into the sets.
+
+        Only current candidates of the puzzle become rows, so it pays off to run the
+        logical techniques first. Works for any supported size.
+
+        :param puzzle: puzzle to build the matrix from, it is not modified
+        """
+        self.size = size = puzzle.size
+        geometry = puzzle.geometry
+        cell_count = geometry.cell_count
+
+        self.rows: Rows = {}
+        self.givens: List[int] = []
+        for cell in range(cell_count):
+            given = puzzle.grid[cell]
+            if given:
+                self.givens.append(cell * size + given - 1)
+
+            for value in (given,) if given else iter_values(puzzle.candidates[cell]):
+                row = cell * size + value - 1
+                digit = value - 1
+                self.rows[row] = [cell,
+                                  cell_count + geometry.cell_row[cell] * size + digit,
+                                  2 * cell_count + geometry.cell_column[cell] * size + digit,
+                                  3 * cell_count + geometry.cell_box[cell] * size + digit]
+
+        self.columns: Columns = {column: set() for column in range(4 * cell_count)}
+        for row, columns in self.rows.items():
+            for column in columns:
+                self.columns[column].add(row)
+
+        self.is_consistent = self._select_givens()
+
+    def _select_givens(self) -> bool:
+        for row in self.givens:
+            if any(column not in self.columns for column in self.rows[row]):
+                # Two givens cover the same constraint, e.g. a value repeated in a row
+                return False
+
+            self._select(row)
+
+        return True
+
+    def _select(self, row: int) -> List[Set[int]]:
+        columns, rows = self.columns, self.rows
+        removed = []
+        for column in rows[row]:
+            for other_row in columns[column]:
+                for other_column in rows[other_row]:
+                    if other_column != column:
+                        columns[other_column].discard(other_row)
+
+            removed.append(columns.pop(column))
+
+        return removed
+
+    def _deselect(self, row: int, removed: List[Set[int]]):
+        columns, rows = self.columns, self.rows
+        for column in reversed(rows[row]):
+            columns[column] = removed.pop()
+            for other_row in columns[column]:
+                for other_column in rows[other_row]:
+                    if other_column != column:
+                        columns[other_column].add(other_row)
+
+    def iter_solutions(self) -> Iterator[List[int]]:
+        """Lazily yield every solution as a flat grid of values.
+
+        Rows of a column are tried in ascending order, always branching on the column
+        with the fewest rows left.
+        """
+        if not self.is_consistent:
+            return
+
+        chosen = list(self.givens)
+        yield from self._search(chosen)
+
+    def _search(self, chosen: List[int]) -> Iterator[List[int]]:
+        columns = self.columns
+        if not columns:
+            yield self._to_grid(chosen)
+            return
+
+        column = self._choose_column()
+        for row in sorted(columns[column]):
+            chosen.append(row)
+            removed = self._select(row)
+            yield from self._search(chosen)
+            self._deselect(row, removed)
+            chosen.pop()
+
+    def _choose_column(self) -> int:
+        # Column with the fewest rows left, same as `min` by row count but without a key call per
+        # column, and a column with no rows ends the scan since the branch is dead anyway
+        columns = self.columns
+        best_column = -1
+        best_count = 1 << 30
+        for column, rows in columns.items():
+            count = len(rows)
+            if count < best_count:
+                if count == 0:
+                    return column
+                best_column, best_count = column, count
+
+        return best_column
+
+    def _to_grid(self, chosen: List[int]) -> List[int]:
+        grid = [0] * (self.size * self.size)
+        for row in chosen:
+            cell, digit = divmod(row, self.size)
+            grid[cell] = digit + 1
+
+        return grid
+
+    def find_solution(self) -> Optional[List[int]]:
+        return next(self.iter_solutions(), None)
+
+
+def solve_exact_cover(puzzle: Puzzle) -> bool:
+    """Solve a puzzle with Algorithm X alone and fill in its grid.
+
+    :param puzzle: puzzle to solve, filled in place if a solution exists
+    :return: whether a solution was found
+    """
+    solution = ExactCover(puzzle).find_solution()
+    if solution is None:
+        return False
+
+    puzzle.fill_grid(solution)
+    return True
@@ -0,0 +1,251 @@
+import argparse
+import random
+import sys
+from collections import deque
+from itertools import count as count_from, islice
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import config as cfg
+from models.batch_io import write_line
+from models.encoding import grid_to_symbols
+from models.exact_cover import ExactCover
+from models.puzzle import Puzzle
+from models.stats import StatsCollector
+from models.sudoku_solver import SudokuSolver, known_techniques
+from models.tech.hidden_single import HiddenSingle
+from models.tech.single_candidate import SingleCandidate
+
+
+class PuzzleGenerator:
+    def __init__(self, size: int = 9,
+                 target_clues: Optional[int] = None,
+                 required_tech: Sequence[str] = (),
+                 symmetric: bool = False,
+                 max_attempts: int = 20):
+        """Generates random puzzles with a unique solution.
+
+        A random complete grid is made first, then clues are removed one by one in random
+        order, putting back every clue without which the puzzle has more than one solution.
+        With `target_clues` removal stops as soon as the target is reached, otherwise the
+        result is a minimal puzzle.
+
+        With `required_tech` the puzzle must also be solvable by logical techniques alone,
+        and every required technique must make progress at least once while solving it.
+        Puzzles that miss a target are thrown away and a new grid is tried.
+
+        :param size: width and height of the puzzle, one of `Puzzle.supported_sizes`
+        :param target_clues: stop removing clues at this count, grids that can't get this low are retried
+        :param required_tech: names of technique classes from `known_techniques`
+        :param symmetric: remove clues in pairs, keeping the puzzle rotationally symmetric
+        :param max_attempts: how many grids to try before giving up on a seed
+        """
+        if size not in Puzzle.supported_sizes:
+            raise ValueError(f'Invalid size: should be one of {tuple(Puzzle.supported_sizes)}, but it\'s {size}')
+
+        unknown_tech = [name for name in required_tech if name not in known_techniques]
+        if unknown_tech:
+            raise ValueError(f'Unknown techniques: {", ".join(unknown_tech)}, '
+                             f'should be some of {", ".join(known_techniques)}')
+
+        self.size = size
+        self.box_size = Puzzle.supported_sizes[size]
+        self.target_clues = target_clues
+        self.required_tech = tuple(required_tech)
+        self.symmetric = symmetric
+        self.max_attempts = max_attempts
+
+        # Uniqueness checks run on every removed clue, singles are the only techniques
+        # that pay for themselves there, search does the rest
+        self.solver = SudokuSolver('trail', tech_classes=(SingleCandidate, HiddenSingle))
+        self.tech_solver: Optional[SudokuSolver] = None
+        # Same techniques without stats, so that it can use `Puzzle.propagate`
+        self.logic_solver: Optional[SudokuSolver] = None
+        if self.required_tech:
+            required_classes = [known_techniques[name] for name in self.required_tech]
+            default_classes = SudokuSolver().tech_classes
+            tech_classes = default_classes + tuple(tech for tech in required_classes if tech not in default_classes)
+            self.tech_solver = SudokuSolver('trail', StatsCollector(), tech_classes=tech_classes)
+            self.logic_solver = SudokuSolver('trail', tech_classes=tech_classes)
+
+    def generate_full_grid(self, rng: random.Random) -> List[int]:
+        # Boxes on the diagonal don't share any unit, so they can be filled with random
+        # permutations independently. The rest is completed by the exact cover search,
+        # which for 4x4 can find the diagonal to be a dead end, then it's drawn again.
+        size, box_size = self.size, self.box_size
+        while True:
+            grid = [0] * (size * size)
+            for box in range(box_size):
+                values = rng.sample(range(1, size + 1), size)
+                for i, value in enumerate(values):
+                    y = box * box_size + i // box_size
+                    x = box * box_size + i % box_size
+                    grid[y * size + x] = value
+
+            solution = ExactCover(Puzzle(size, grid)).find_solution()
+            if solution is not None:
+                return solution
+
+    def remove_clues(self, solution: List[int], rng: random.Random) -> List[int]:
+        grid = solution[:]
+        cell_count = len(grid)
+        clue_count = cell_count
+        cells = list(range(cell_count))
+        rng.shuffle(cells)
+        for cell in cells:
+            if self.target_clues is not None and clue_count <= self.target_clues:
+                break
+
+            if not grid[cell]:
+                continue
+
+            group = {cell, cell_count - 1 - cell} if self.symmetric else {cell}
+            removed = [(group_cell, grid[group_cell]) for group_cell in group]
+            for group_cell in group:
+                grid[group_cell] = 0
+
+            if self.has_other_solution(grid, solution, group):
+                for group_cell, value in removed:
+                    grid[group_cell] = value
+            else:
+                clue_count -= len(group)
+
+        return grid
+
+    def has_other_solution(self, grid: List[int], solution: List[int], cells: Iterable[int]) -> bool:
+        # The grid had only `solution` before `cells` were emptied, so any other solution differs from it
+        # in one of them. Looking for a solution with each of them ruled out in turn is a first-solution
+        # search, which is much cheaper than counting solutions of the whole grid.
+        for cell in cells:
+            puzzle = Puzzle(self.size, grid[:])
+            puzzle.remove_candidate_from_group(solution[cell], (cell,))
+            if self.solver.solve(puzzle):
+                return True
+
+        return False
+
+    def uses_required_tech(self, grid: List[int]) -> bool:
+        # Most grids need guessing, the solver without stats turns them down before the measured solve
+        if not self.logic_solver.solve_logically(Puzzle(self.size, grid[:])):
+            return False
+
+        solver = self.tech_solver
+        solver.reset_tech_stats()
+        if not solver.solve_logically(Puzzle(self.size, grid[:])):
+            return False
+
+        return all(solver.stats.get(name).successful_uses for name in self.required_tech)
+
+    def generate(self, seed: int) -> Optional[str]:
+        """Generate one puzzle, the same seed always gives the same puzzle.
+
+        :return: puzzle string or None if no grid met the targets within `max_attempts`
+        """
+        rng = random.Random(seed)
+        for _ in range(self.max_attempts):
+            grid = self.remove_clues(self.generate_full_grid(rng), rng)
+            if self.target_clues is not None and self.size * self.size - grid.count(0) > self.target_clues:
+                continue
+            if self.tech_solver is not None and not self.uses_required_tech(grid):
+                continue
+
+            return grid_to_symbols(grid)
+
+        return None
+
+    def generate_stream(self, count: int, seed: int = 0,
+                        workers: int = 1,
+                        chunk_size: int = 4) -> Iterator[str]:
+        """Lazily generate `count` puzzle strings, optionally spreading the work over several processes.
+
+        Puzzle `i` is generated from seed `seed + i`, seeds that give up are skipped, so the
+        output depends only on the arguments and not on timing. At most `2 * workers`
+        chunks of seeds are in flight, and no more than the remaining puzzles need.
+
+        :param count: how many puzzles to yield
+        :param seed: first seed
+        :param workers: number of worker processes, 1 generates everything in this process
+        :param chunk_size: how many seeds a worker gets at once
+        :return: iterator of puzzle strings
+        """
+        if count <= 0:
+            return
+
+        previous_output = cfg.solve_output_enabled
+        cfg.solve_output_enabled = False
+        generated = 0
+        try:
+            if workers <= 1:
+                for puzzle_seed in count_from(seed):
+                    puzzle_string = self.generate(puzzle_seed)
+                    if puzzle_string is not None:
+                        yield puzzle_string
+                        generated += 1
+                        if generated >= count:
+                            return
+                return
+
+            initargs = (self.size, self.target_clues, self.required_tech, self.symmetric, self.max_attempts)
+            seeds = count_from(seed)
+            with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                pending = deque()
+                while generated < count:
+                    # Keep every worker busy, but don't queue up more seeds than the remaining puzzles need
+                    while len(pending) < workers or (len(pending) < 2 * workers
+                                                     and len(pending) * chunk_size < count - generated):
+                        pending.append(pool.apply_async(_generate_chunk, (list(islice(seeds, chunk_size)),)))
+
+                    for puzzle_string in pending.popleft().get():
+                        if puzzle_string is not None:
+                            yield puzzle_string
+                            generated += 1
+                            if generated >= count:
+                                return
+        finally:
+            cfg.solve_output_enabled = previous_output
+
+
+_worker_generator: Optional[PuzzleGenerator] = None
+
+
+def _init_worker(size: int, target_clues: Optional[int], required_tech: Sequence[str],
+                 symmetric: bool, max_attempts: int):
+    global _worker_generator
+    cfg.solve_output_enabled = False
+    _worker_generator = PuzzleGenerator(size, target_clues, required_tech, symmetric, max_attempts)
+
+
+def _generate_chunk(seeds: Sequence[int]) -> List[Optional[str]]:
+    return [_worker_generator.generate(seed) for seed in seeds]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Generate puzzles with a unique solution, one puzzle string per line')
+    parser.add_argument('count', type=int, help='number of puzzles to generate')
+    parser.add_argument('--size', type=int, default=9, choices=sorted(Puzzle.supported_sizes))
+    parser.add_argument('--clues', type=int, help='target clue count, minimal puzzles by default')
+    parser.add_argument('--require', nargs='+', default=(), choices=known_techniques, metavar='TECH',
+                        help=f'techniques the solve must use, some of: {", ".join(known_techniques)}')
+    parser.add_argument('--symmetric', action='store_true', help='keep clues rotationally symmetric')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='write puzzles here instead of stdout')
+    args = parser.parse_args(argv)
+
+    generator = PuzzleGenerator(args.size, args.clues, args.require, args.symmetric)
+    puzzle_strings = generator.generate_stream(args.count, seed=args.seed, workers=args.workers)
+    if args.output:
+        with open(args.output, 'w') as f:
+            for puzzle_string in puzzle_strings:
+                write_line(f, puzzle_string)
+    else:
+        for puzzle_string in puzzle_strings:
+            # Puzzles take a while each, so they are shown as soon as they are ready
+            write_line(sys.stdout, puzzle_string, flush=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
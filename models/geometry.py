@@ -0,0 +1,65 @@
+from functools import lru_cache
+from math import isqrt
+from typing import Tuple
+
+Cells = Tuple[int, ...]
+
+
+class Geometry:
+    def __init__(self, size: int):
+        """Precomputed cell tables for a grid of given size.
+
+        Cells are addressed by a flat index `y * size + x`. Units are numbered
+        rows first, then columns, then boxes, so there are `3 * size` of them.
+        Everything here is immutable, build it through `get_geometry`.
+
+        :param size: width and height as a single number
+        """
+        self.size = size
+        self.box_size = isqrt(size)
+        self.cell_count = size * size
+
+        box_size = self.box_size
+        cells = range(self.cell_count)
+
+        self.cell_row: Cells = tuple(cell // size for cell in cells)
+        self.cell_column: Cells = tuple(cell % size for cell in cells)
+        self.cell_box: Cells = tuple((cell // size) // box_size * box_size + (cell % size) // box_size
+                                     for cell in cells)
+
+        self.rows: Tuple[Cells, ...] = tuple(tuple(cell for cell in cells if self.cell_row[cell] == i)
+                                             for i in range(size))
+        self.columns: Tuple[Cells, ...] = tuple(tuple(cell for cell in cells if self.cell_column[cell] == i)
+                                                for i in range(size))
+        self.boxes: Tuple[Cells, ...] = tuple(tuple(cell for cell in cells if self.cell_box[cell] == i)
+                                              for i in range(size))
+        self.units: Tuple[Cells, ...] = self.rows + self.columns + self.boxes
+
+        # Unit ids (indices into `units`) of the row, column and box of every cell
+        self.cell_units: Tuple[Tuple[int, int, int], ...] = tuple(
+            (self.cell_row[cell], size + self.cell_column[cell], 2 * size + self.cell_box[cell])
+            for cell in cells)
+
+        # Every cell as a bitmask of cells, for sets of cells kept in a single int
+        self.cell_bit: Cells = tuple(1 << cell for cell in cells)
+
+        # Cells of every unit as a bitmask of cells
+        self.unit_masks: Cells = tuple(sum(1 << cell for cell in unit) for unit in self.units)
+
+        # Same unit ids as bitmasks, for marking units as changed in one go
+        self.cell_unit_mask: Cells = tuple(sum(1 << unit_id for unit_id in unit_ids) for unit_ids in self.cell_units)
+        self.all_units_mask = (1 << len(self.units)) - 1
+        self.box_units_mask = self.all_units_mask & ~((1 << 2 * size) - 1)
+        self.line_units_mask = self.all_units_mask & ~self.box_units_mask
+
+        self.peers: Tuple[Cells, ...] = tuple(
+            tuple(sorted((set(self.rows[self.cell_row[cell]]) | set(self.columns[self.cell_column[cell]])
+                          | set(self.boxes[self.cell_box[cell]])) - {cell}))
+            for cell in cells)
+        # Same peers as a bitmask of cells
+        self.peer_masks: Cells = tuple(sum(1 << peer for peer in peers) for peers in self.peers)
+
+
+@lru_cache
+def get_geometry(size: int) -> Geometry:
+    return Geometry(size)
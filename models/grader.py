@@ -0,0 +1,203 @@
+import argparse
+import sys
+from collections import deque
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+import config as cfg
+from models.batch_io import Source, iter_chunks, read_puzzle_strings, write_line
+from models.puzzle import Puzzle
+from models.scheduler import FixedOrderPolicy
+from models.stats import StatsCollector
+from models.sudoku_solver import SudokuSolver, known_techniques
+
+# Puzzle string and its grade
+GradeResult = Tuple[str, 'Grade']
+
+
+class Grade:
+    def __init__(self, hardest_technique: Optional[str], difficulty: int, steps: int,
+                 needs_bruteforce: bool, branches: int, is_solved: bool, techniques: Dict[str, int]):
+        """Difficulty rating of a puzzle.
+
+        :param hardest_technique: name of the hardest technique that made progress, None if none did
+        :param difficulty: rank of the hardest technique in the solver's order, starting at 1,
+            0 if no technique was needed, one past the last technique if brute force was needed
+        :param steps: number of technique applications that made progress
+        :param needs_bruteforce: whether logical techniques alone got stuck
+        :param branches: number of cells the search had to guess on
+        :param is_solved: whether a solution was found at all
+        :param techniques: successful applications of every technique that made progress
+        """
+        self.hardest_technique = hardest_technique
+        self.difficulty = difficulty
+        self.steps = steps
+        self.needs_bruteforce = needs_bruteforce
+        self.branches = branches
+        self.is_solved = is_solved
+        self.techniques = techniques
+
+    def __repr__(self) -> str:
+        return (f'Grade(hardest_technique={self.hardest_technique!r}, difficulty={self.difficulty}, '
+                f'steps={self.steps}, needs_bruteforce={self.needs_bruteforce}, branches={self.branches}, '
+                f'is_solved={self.is_solved})')
+
+    def to_line(self) -> str:
+        # Fields of a batch grade line after the puzzle string
+        return (f'{self.hardest_technique or "-"} {self.difficulty} {self.steps} '
+                f'{int(self.needs_bruteforce)} {self.branches} {int(self.is_solved)}')
+
+
+class Grader:
+    def __init__(self):
+        """Rates puzzles by the techniques needed to solve them.
+
+        Every known technique is enabled and tried in the solver's usual order: high priority
+        ones repeatedly, then normal priority, then low priority only when nothing else helps.
+        So the later a technique comes in that order, the harder it is considered. After every
+        technique that makes progress the solver starts over from the singles, so that a harder
+        technique only runs when all easier ones are stuck. Whatever the techniques leave is
+        searched depth-first, counting the guesses.
+        """
+        tech_classes = tuple(known_techniques.values())
+        self.solver = SudokuSolver('trail', StatsCollector(), tech_classes=tech_classes,
+                                   policy=FixedOrderPolicy(stop_on_progress=True))
+        # Search is done without stats, so that guesses don't count as technique steps
+        self.search_solver = SudokuSolver('trail', tech_classes=tech_classes)
+
+        solver = self.solver
+        self.tech_order: Dict[str, int] = {
+            type(tech).__name__: rank
+            for rank, tech in enumerate(solver.high_priority_tech + solver.normal_priority_tech
+                                        + solver.low_priority_tech, 1)
+        }
+
+    def grade(self, puzzle: Puzzle) -> Grade:
+        """Grade a puzzle, the puzzle itself is left untouched. Solve output is always off."""
+        previous_output = cfg.solve_output_enabled
+        cfg.solve_output_enabled = False
+        try:
+            return self.grade_silently(puzzle)
+        finally:
+            cfg.solve_output_enabled = previous_output
+
+    def grade_silently(self, puzzle: Puzzle) -> Grade:
+        stats = self.solver.stats
+        stats.reset()
+        work_puzzle = puzzle.copy()
+        is_valid = work_puzzle.has_valid_clues()
+        is_solved = is_valid and self.solver.solve_logically(work_puzzle)
+
+        techniques = {name: tech_stats.successful_uses for name, tech_stats in stats.techniques.items()
+                      if tech_stats.successful_uses}
+        tech_order = self.tech_order
+        hardest_technique = max(techniques, key=tech_order.__getitem__, default=None)
+        difficulty = tech_order[hardest_technique] if hardest_technique else 0
+
+        needs_bruteforce = is_valid and not is_solved
+        branches = 0
+        if needs_bruteforce:
+            search_solver = self.search_solver
+            bruteforce_before = search_solver.bruteforce_counter
+            work_puzzle.start_trail()
+            is_solved = next(search_solver.iter_trail_solutions(work_puzzle), None) is not None
+            branches = search_solver.bruteforce_counter - bruteforce_before
+            difficulty = len(tech_order) + 1
+
+        return Grade(hardest_technique, difficulty, sum(techniques.values()),
+                     needs_bruteforce, branches, is_solved, techniques)
+
+    def grade_string(self, puzzle_string: str) -> GradeResult:
+        return puzzle_string, self.grade(Puzzle.from_string(puzzle_string))
+
+    def grade_stream(self, puzzle_strings: Iterable[str],
+                     workers: int = 1,
+                     chunk_size: int = 250) -> Iterator[GradeResult]:
+        """Lazily grade puzzle strings, optionally spreading them over several processes.
+
+        Grades are yielded in input order, with at most `2 * workers` chunks in flight.
+
+        :param puzzle_strings: puzzles to grade, one string each, can be any iterable
+        :param workers: number of worker processes, 1 grades everything in this process
+        :param chunk_size: how many puzzle strings a worker gets at once
+        :return: iterator of (puzzle string, grade) for every puzzle
+        """
+        if workers <= 1:
+            for puzzle_string in puzzle_strings:
+                yield self.grade_string(puzzle_string)
+            return
+
+        with Pool(workers, initializer=_init_worker) as pool:
+            pending = deque()
+            for chunk in iter_chunks(puzzle_strings, chunk_size):
+                pending.append(pool.apply_async(_grade_chunk, (chunk,)))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().get()
+
+            while pending:
+                yield from pending.popleft().get()
+
+    def batch_grade(self, source: Source, sink: Optional[TextIO] = None, workers: int = 1) -> Dict[str, int]:
+        """Grade every puzzle from a source.
+
+        Every puzzle gets a line `<puzzle string> <hardest technique> <difficulty> <steps>
+        <needs bruteforce> <branches> <is solved>`, with `-` when no technique was needed
+        and 0/1 for the flags.
+
+        :param source: path to a batch file, an open text stream or `-` for stdin
+        :param sink: text stream for grade lines, optional
+        :param workers: number of worker processes
+        :return: how many puzzles have each hardest technique, `Bruteforce` for those that need a search
+        """
+        histogram = {name: 0 for name in self.tech_order}
+        histogram['Bruteforce'] = 0
+        for puzzle_string, grade in self.grade_stream(read_puzzle_strings(source), workers=workers):
+            if grade.needs_bruteforce:
+                histogram['Bruteforce'] += 1
+            elif grade.hardest_technique:
+                histogram[grade.hardest_technique] += 1
+            write_line(sink, f'{puzzle_string} {grade.to_line()}')
+
+        return histogram
+
+
+_worker_grader: Optional[Grader] = None
+
+
+def _init_worker():
+    global _worker_grader
+    cfg.solve_output_enabled = False
+    _worker_grader = Grader()
+
+
+def _grade_chunk(puzzle_strings: Sequence[str]) -> List[GradeResult]:
+    return [_worker_grader.grade_string(puzzle_string) for puzzle_string in puzzle_strings]
+
+
+def grade(puzzle: Puzzle) -> Grade:
+    """Grade a single puzzle with a fresh `Grader`, create one `Grader` to grade many."""
+    return Grader().grade(puzzle)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Grade the difficulty of every puzzle in a batch')
+    parser.add_argument('source', help='batch file path or - for stdin')
+    parser.add_argument('--output', help='write grade lines here, stdout by default')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    grader = Grader()
+    if args.output:
+        with open(args.output, 'w') as f:
+            histogram = grader.batch_grade(args.source, f, workers=args.workers)
+    else:
+        histogram = grader.batch_grade(args.source, sys.stdout, workers=args.workers)
+
+    for name, count in histogram.items():
+        print(f'{name}: {count}', file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
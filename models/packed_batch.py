@@ -0,0 +1,238 @@
+import argparse
+import mmap
+import random
+import struct
+import sys
+from math import isqrt
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+from models.batch_io import Source, read_puzzle_strings, write_line
+from models.encoding import symbols, symbols_to_grid
+from models.puzzle import Puzzle
+
+# Magic, format version, puzzle size, bits per cell, padding, record count
+header_struct = struct.Struct('<4sBBBxQ')
+magic = b'SDKB'
+version = 1
+
+
+def get_bits_per_cell(size: int) -> int:
+    # Nibbles whenever every value fits, so that records can be packed and unpacked as hex
+    return 4 if size < 16 else size.bit_length()
+
+
+def get_record_size(size: int) -> int:
+    return (size * size * get_bits_per_cell(size) + 7) // 8
+
+
+def encode_record(puzzle_string: str, size: int) -> bytes:
+    cell_count = size * size
+    record_size = get_record_size(size)
+    values = symbols_to_grid(puzzle_string)
+    if max(values, default=0) > size:
+        raise ValueError(f'Invalid puzzle string: values should be at most {symbols[size]} for {size}x{size}')
+
+    if get_bits_per_cell(size) == 4:
+        # One nibble per cell, high nibble first, so that `decode_records` can unpack them as hex
+        values += [0] * (2 * record_size - cell_count)
+        return bytes(high << 4 | low for high, low in zip(values[::2], values[1::2]))
+
+    bits = get_bits_per_cell(size)
+    packed = 0
+    for i, value in enumerate(values):
+        packed |= value << (bits * i)
+    return packed.to_bytes(record_size, 'little')
+
+
+def decode_records(buffer: Union[bytes, memoryview], size: int) -> List[str]:
+    """Unpack consecutive records into puzzle strings."""
+    cell_count = size * size
+    record_size = get_record_size(size)
+    if get_bits_per_cell(size) == 4:
+        digits = buffer.hex()
+        hex_size = 2 * record_size
+        return [digits[start:start + cell_count] for start in range(0, len(digits), hex_size)]
+
+    bits = get_bits_per_cell(size)
+    cell_mask = (1 << bits) - 1
+    result = []
+    for start in range(0, len(buffer), record_size):
+        packed = int.from_bytes(buffer[start:start + record_size], 'little')
+        result.append(''.join(symbols[(packed >> (bits * i)) & cell_mask] for i in range(cell_count)))
+
+    return result
+
+
+def pack_strings(puzzle_strings: Iterable[str], path: Union[str, Path]) -> int:
+    """Write puzzle strings into a packed batch file.
+
+    The puzzle size is taken from the first string, all others must have the same length.
+
+    :param puzzle_strings: puzzles to store, one string each, can be any iterable
+    :param path: file to write
+    :return: number of stored puzzles
+    """
+    count = 0
+    size = 0
+    with open(path, 'wb') as f:
+        f.write(header_struct.pack(magic, version, size, 0, count))
+        for puzzle_string in puzzle_strings:
+            if not size:
+                size = isqrt(len(puzzle_string))
+                if size not in Puzzle.supported_sizes or size * size != len(puzzle_string):
+                    raise ValueError(f'Invalid puzzle string length: {len(puzzle_string)}')
+            elif len(puzzle_string) != size * size:
+                raise ValueError(f'Puzzle string {count + 1} has length {len(puzzle_string)}, '
+                                 f'expected {size * size}')
+
+            f.write(encode_record(puzzle_string, size))
+            count += 1
+
+        f.seek(0)
+        f.write(header_struct.pack(magic, version, size, get_bits_per_cell(size) if size else 0, count))
+
+    return count
+
+
+def pack_text(source: Source, path: Union[str, Path]) -> int:
+    """Convert a text batch (one puzzle string per line) into a packed batch file."""
+    return pack_strings(read_puzzle_strings(source), path)
+
+
+def unpack_to_text(path: Union[str, Path], sink: TextIO, chunk_size: int = 4096) -> int:
+    """Write every puzzle of a packed batch file as a line of text.
+
+    :return: number of written puzzles
+    """
+    with PackedBatch(path) as batch:
+        for start, stop in batch.chunk_ranges(chunk_size):
+            sink.write(''.join(puzzle_string + '\n' for puzzle_string in batch.get_strings(start, stop)))
+
+        return len(batch)
+
+
+class PackedBatch:
+    def __init__(self, path: Union[str, Path]):
+        """Read-only view of a packed batch file.
+
+        The file is a 16-byte header followed by fixed-size records, one per puzzle, with
+        cell values packed into 4 bits each (5 bits for 16x16 and 25x25). The file is memory-mapped,
+        so any puzzle or range of puzzles is reached in O(1) without reading the rest, and
+        `records` gives zero-copy slices of the mapping. Memoryviews obtained from `record`
+        and `records` must be released before `close`.
+
+        :param path: file written by `pack_strings` or `pack_text`
+        """
+        self.path = Path(path)
+        self.file = open(path, 'rb')
+        try:
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f'{path} is not a packed batch file')
+
+        if len(self.mmap) < header_struct.size:
+            self.close()
+            raise ValueError(f'{path} is not a packed batch file')
+
+        file_magic, file_version, size, bits_per_cell, count = header_struct.unpack_from(self.mmap)
+        if file_magic != magic or file_version != version:
+            self.close()
+            raise ValueError(f'{path} is not a packed batch file of version {version}')
+
+        # An empty batch has no size, every other one needs a supported size and its matching record layout
+        if size or count or bits_per_cell:
+            if size not in Puzzle.supported_sizes or bits_per_cell != get_bits_per_cell(size):
+                self.close()
+                raise ValueError(f'{path} has an invalid header: size {size} with {bits_per_cell} bits per cell')
+
+        self.size = size
+        self.count = count
+        self.record_size = get_record_size(size) if size else 0
+        if len(self.mmap) < header_struct.size + count * self.record_size:
+            self.close()
+            raise ValueError(f'{path} is truncated: {count} puzzles of {self.record_size} bytes need '
+                             f'{header_struct.size + count * self.record_size} bytes, but it has {len(self.mmap)}')
+
+        self.view = memoryview(self.mmap)[header_struct.size:header_struct.size + count * self.record_size]
+
+    def __enter__(self) -> 'PackedBatch':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if getattr(self, 'view', None) is not None:
+            self.view.release()
+            self.view = None
+        self.mmap.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, index: int) -> memoryview:
+        if not 0 <= index < self.count:
+            raise IndexError(f'Puzzle index {index} out of range for {self.count} puzzles')
+
+        start = index * self.record_size
+        return self.view[start:start + self.record_size]
+
+    def records(self, start: int, stop: int) -> memoryview:
+        # Zero-copy slice of consecutive records, bounds are clamped like for lists
+        start, stop, _ = slice(start, stop).indices(self.count)
+        return self.view[start * self.record_size:max(start, stop) * self.record_size]
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += self.count
+
+        with self.record(index) as record:
+            return decode_records(record, self.size)[0]
+
+    def get_strings(self, start: int, stop: int) -> List[str]:
+        with self.records(start, stop) as records:
+            return decode_records(records, self.size)
+
+    def chunk_ranges(self, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        for start in range(0, self.count, chunk_size):
+            yield start, min(start + chunk_size, self.count)
+
+    def __iter__(self) -> Iterator[str]:
+        for start, stop in self.chunk_ranges(4096):
+            yield from self.get_strings(start, stop)
+
+    def random_string(self, rng: Optional[random.Random] = None) -> Optional[str]:
+        if not self.count:
+            return None
+
+        return self[(rng or random).randrange(self.count)]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Convert batches between the text and the packed binary format')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack_parser = subparsers.add_parser('pack', help='text batch to packed batch')
+    pack_parser.add_argument('source', help='text batch path or - for stdin')
+    pack_parser.add_argument('target', type=Path)
+    unpack_parser = subparsers.add_parser('unpack', help='packed batch to text batch')
+    unpack_parser.add_argument('source', type=Path)
+    unpack_parser.add_argument('target', nargs='?', type=Path, help='stdout by default')
+    args = parser.parse_args(argv)
+
+    if args.command == 'pack':
+        count = pack_text(args.source, args.target)
+    elif args.target:
+        with open(args.target, 'w') as f:
+            count = unpack_to_text(args.source, f)
+    else:
+        count = unpack_to_text(args.source, sys.stdout)
+
+    write_line(sys.stderr, f'{count} puzzles converted')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,118 +1,92 @@
 from collections import Counter
-from functools import lru_cache
 from pathlib import Path
 from string import ascii_uppercase
-from typing import Optional, List, Dict, Set, Tuple
+from typing import Optional, List, Dict, Set, Iterable, Tuple
 
-import pyperclip
-
-import config as cfg
+from models.bitmask import (Mask, full_mask, iter_indices, iter_values, mask_union, popcount, value_to_bit,
+                            values_to_mask)
+from models.encoding import grid_to_symbols, symbols, symbols_to_grid
+from models.geometry import Cells, get_geometry
+from models.trace import TraceEvent, Tracer
 
 NumSet = Set[int]
-IndexSet = Set[Tuple[int, int]]
 
 
 def convert_index(x: int, y: int) -> str:
     return ascii_uppercase[y] + str(x + 1)
 
 
-@lru_cache
-def get_box_base_index(box_size: int, x: int, y: int) -> Tuple[int, int]:
-    return x - x % box_size, y - y % box_size
-
-
-@lru_cache
-def get_row_indices(size: int, y: int) -> IndexSet:
-    return set(((x, y) for x in range(size)))
-
-
-@lru_cache
-def get_column_indices(size, x: int) -> IndexSet:
-    return set(((x, y) for y in range(size)))
-
-
-@lru_cache
-def get_row_indices_by_xy(size: int, _x: int, y: int) -> IndexSet:
-    return set(((x, y) for x in range(size)))
-
-
-@lru_cache
-def get_column_indices_by_xy(size, x: int, _y: int) -> IndexSet:
-    return set(((x, y) for y in range(size)))
-
-
-@lru_cache
-def get_box_indices(box_size: int, x: int, y: int) -> IndexSet:
-    box_x, box_y = get_box_base_index(box_size, x, y)
-    return set(((x, y) for y in range(box_y, box_y + box_size) for x in range(box_x, box_x + box_size)))
-
-
-@lru_cache
-def get_rcb_indices(size: int, box_size: int, x: int, y: int) -> IndexSet:
-    # Get a combined set of indices from row, column and box
-    return get_row_indices(size, y) | get_column_indices(size, x) | get_box_indices(box_size, x, y)
-
-
-@lru_cache
-def get_all_row_indices(size: int) -> List[IndexSet]:
-    return [get_row_indices(size, y) for y in range(size)]
-
-
-@lru_cache
-def get_all_column_indices(size: int) -> List[IndexSet]:
-    return [get_column_indices(size, x) for x in range(size)]
-
-
-@lru_cache
-def get_all_box_indices(size: int, box_size: int) -> List[IndexSet]:
-    result = []
-    for y in range(0, size, box_size):
-        for x in range(0, size, box_size):
-            result.append(get_box_indices(box_size, x, y))
-
-    return result
-
-
-@lru_cache
-def get_all_group_indices(size: int, box_size: int) -> List[IndexSet]:
-    return get_all_row_indices(size) + get_all_column_indices(size) + get_all_box_indices(size, box_size)
+def convert_cell(cell: int, size: int) -> str:
+    y, x = divmod(cell, size)
+    return convert_index(x, y)
 
 
 class Puzzle:
-    supported_sizes: Dict[int, int] = {4: 2, 9: 3, 16: 4}
+    supported_sizes: Dict[int, int] = {4: 2, 9: 3, 16: 4, 25: 5}
+    # Set by the solver while tracing, placements and eliminations are reported to it
+    tracer: Optional[Tracer] = None
+    # Set by the solver to place singles as soon as a change creates them, see `propagate`
+    auto_propagate = False
 
     def __init__(self, size: int = 9,
-                 grid: List[List[int]] = None,
-                 candidates: List[List[NumSet]] = None):
+                 grid: List[int] = None,
+                 candidates: List[Mask] = None):
         """Represents a sudoku puzzle.
 
-        Grids that are supported: 9x9, 4x4 and 16x16.
-        Supported block sizes are 3x3, 2x2 and 4x4, respectively.
+        Grids that are supported: 9x9, 4x4, 16x16 and 25x25.
+        Supported block sizes are 3x3, 2x2, 4x4 and 5x5, respectively.
         Supply a grid object or don't supply anything and make an empty grid.
+        Cells are addressed by a flat index `y * size + x`, see `models.geometry`.
 
-        :param size: width and height as a single number (4, 9 or 16)
-        :param grid: a grid object to be used, optional
-        :param candidates: candidates to be supplied, optional
+        :param size: width and height as a single number (4, 9, 16 or 25)
+        :param grid: a flat list of `size * size` cell values to be used, optional
+        :param candidates: a flat list of candidate bitmasks to be supplied, optional
         """
         if size not in self.supported_sizes:
             raise ValueError(f'Invalid puzzle: unsupported puzzle size ({size})')
 
         self.size = size
         self.box_size = self.supported_sizes[size]
-        self.all_possible_values = set(range(1, self.size + 1))
+        self.all_possible_values = full_mask(self.size)
+
+        self.geometry = get_geometry(size)
+        self.units = self.geometry.units
+        self.peers = self.geometry.peers
 
         if grid is None:
-            self.grid: List[List[int]] = [[0 for _ in range(self.size)] for _ in range(self.size)]
+            self.grid: List[int] = [0] * self.geometry.cell_count
         else:
             self.grid = grid
 
-        if candidates is None:
-            self.candidates: List[List[NumSet]] = self.get_all_candidates()
+        from_grid = candidates is None
+        if from_grid:
+            self.candidates: List[Mask] = self.get_all_candidates()
         else:
             self.candidates = candidates
 
+        # Units changed since each consumer (a technique) last looked, as unit id bitmasks
+        self.dirty_units: Dict[str, Mask] = {}
+
+        # Undo log of (cell, old value, old candidates), only kept while a trail search runs
+        self.trail: Optional[List[Tuple[int, int, Mask]]] = None
+
+        # Unsolved cells by number of candidates, as bitmasks of cells, and the number of filled cells.
+        # Kept up to date by every change, so that search and the solved check don't scan the grid.
+        # Bucket 0 holds unsolved cells without candidates, the puzzle is impossible while it isn't empty.
+        self.count_buckets: List[Mask] = []
+        self.filled_count = 0
+        # Cells where each digit (index `value - 1`) is still a candidate, as bitmasks of cells.
+        # `digit_cells[digit] & geometry.unit_masks[unit_id]` are the places left for a digit in a unit,
+        # and their popcount is how many there are.
+        self.digit_cells: List[Mask] = []
+        self.index_cells(from_grid)
+        # Candidates removed so far, by eliminations and by placements. It never goes down, so the difference
+        # between two readings is what the steps in between removed, without counting the whole grid.
+        self.removed_count = 0
+
         self.original_clue_count = self.count_cells()
-        self._is_solved = False
+        # Whether `propagate` is running, changes it makes don't start another one
+        self.propagating = False
 
     @classmethod
     def from_file(cls, filename: str) -> Optional['Puzzle']:
@@ -152,7 +126,7 @@ class Puzzle:
         def parse_num(num: str) -> int:
             return int(num) if num in suitable_num_strings else 0
 
-        grid = [list(map(parse_num, row.split())) for row in rows_list]
+        grid = [parse_num(num) for row in rows_list for num in row.split()]
 
         return cls(size, grid)
 
@@ -160,127 +134,242 @@ class Puzzle:
     def from_string(cls, puzzle_string: str) -> 'Puzzle':
         """Load a puzzle from a string.
 
-        Format: everything in one line, no spaces. Unknown cells are `0`.
+        Format: everything in one line, no spaces, one character per cell. Unknown cells are `0` or `.`,
+        values above 9 are letters: `A` is 10, `B` is 11 and so on up to `P` for 25, see `models.encoding`.
+        The size follows from the length.
 
         Example: 030072001000030090518000003050203100000705306000640205200060014007000630000008900
 
-        .. note:: Only 4x4 and 9x9 puzzles are supported due to ambiguity of 16x16
-            (`111` could be both `(11, 1)` and `(1, 11)`)
-
         :param puzzle_string: string to get puzzle grid from
         :return: Instance of Puzzle
         """
-        allowed_lengths = {16: 4, 81: 9}
+        allowed_lengths = {size * size: size for size in cls.supported_sizes}
         puzzle_string = puzzle_string.strip()
         if (slen := len(puzzle_string)) not in allowed_lengths:
             raise ValueError(f"Invalid puzzle string: "
                              f"length should be one of {tuple(allowed_lengths)}, but it's {slen}")
 
         size = allowed_lengths[slen]
-        try:
-            grid = [[int(x) for x in puzzle_string[i * size:i * size + size]] for i in range(size)]
-        except ValueError as e:
-            raise ValueError('Invalid puzzle string: all characters should be digits') from e
+        grid = symbols_to_grid(puzzle_string)
+        if max(grid) > size:
+            raise ValueError(f'Invalid puzzle string: values should be at most {symbols[size]} for {size}x{size}')
 
         return cls(size, grid)
 
     def copy(self) -> 'Puzzle':
-        return Puzzle(self.size,
-                      [[x for x in row] for row in self.grid],
-                      [[set(x) for x in row] for row in self.candidates])
+        # Takes the indexes over instead of rebuilding them, search makes a copy for every branch.
+        # Every attribute is set here, and every container is copied, so a copy never shares state with its source.
+        puzzle = Puzzle.__new__(Puzzle)
+        puzzle.size = self.size
+        puzzle.box_size = self.box_size
+        puzzle.all_possible_values = self.all_possible_values
+        puzzle.geometry = self.geometry
+        puzzle.units = self.units
+        puzzle.peers = self.peers
+        puzzle.grid = self.grid[:]
+        puzzle.candidates = self.candidates[:]
+        puzzle.dirty_units = self.dirty_units.copy()
+        puzzle.trail = None
+        puzzle.count_buckets = self.count_buckets[:]
+        puzzle.filled_count = self.filled_count
+        puzzle.digit_cells = self.digit_cells[:]
+        puzzle.removed_count = self.removed_count
+        puzzle.original_clue_count = self.filled_count
+        puzzle.propagating = False
+        puzzle.tracer = self.tracer
+        puzzle.auto_propagate = self.auto_propagate
+        return puzzle
+
+    def update_from(self, other: 'Puzzle'):
+        # Take over the state of another puzzle of the same size, e.g. a solved branch
+        self.grid[:] = other.grid
+        self.candidates[:] = other.candidates
+        self.dirty_units = {}
+        self.count_buckets[:] = other.count_buckets
+        self.filled_count = other.filled_count
+        self.digit_cells[:] = other.digit_cells
+        self.removed_count = other.removed_count
+
+    def fill_grid(self, values: List[int]):
+        # Put in a complete solution found elsewhere, e.g. by exact cover search
+        self.grid[:] = values
+        self.candidates[:] = [0] * self.geometry.cell_count
+        self.mark_units_dirty(self.geometry.all_units_mask)
+        self.index_cells()
+
+    def index_cells(self, from_grid: bool = False):
+        """Build `count_buckets`, `filled_count` and `digit_cells` from scratch.
+
+        :param from_grid: candidates are the ones `get_all_candidates` gives, so a digit's places are
+            the empty cells outside the units it's placed in, which is cheaper than going through
+            every candidate of every cell
+        """
+        count_buckets = [0] * (self.size + 1)
+        digit_cells = [0] * self.size
+        for cell, cands in enumerate(self.candidates):
+            if not self.grid[cell]:
+                cell_bit = 1 << cell
+                count_buckets[cands.bit_count()] |= cell_bit
+                while cands and not from_grid:
+                    low = cands & -cands
+                    digit_cells[low.bit_length() - 1] |= cell_bit
+                    cands ^= low
+
+        if from_grid:
+            # Cells seeing each placed value, by value
+            blocked = [0] * (self.size + 1)
+            for value, peer_mask in zip(self.grid, self.geometry.peer_masks):
+                if value:
+                    blocked[value] |= peer_mask
+            empty_cells = mask_union(count_buckets)
+            digit_cells = [empty_cells & ~cells for cells in blocked[1:]]
+
+        self.count_buckets = count_buckets
+        self.filled_count = self.geometry.cell_count - self.grid.count(0)
+        self.digit_cells = digit_cells
+
+    def start_trail(self):
+        """Start recording every change of grid and candidates so that it can be rolled back.
+
+        Used by backtracking search to explore branches on a single puzzle instead of copies.
+        """
+        self.trail = []
+
+    def stop_trail(self):
+        self.trail = None
+
+    def get_trail_mark(self) -> int:
+        return len(self.trail)
+
+    def undo_to(self, mark: int):
+        # Roll back all changes recorded after the mark, newest first
+        trail = self.trail
+        grid = self.grid
+        candidates = self.candidates
+        cell_unit_mask = self.geometry.cell_unit_mask
+        count_buckets = self.count_buckets
+        digit_cells = self.digit_cells
+        touched = 0
+        while len(trail) > mark:
+            cell, value, cands = trail.pop()
+            cell_bit = 1 << cell
+            if grid[cell]:
+                self.filled_count -= 1
+            else:
+                count_buckets[popcount(candidates[cell])] ^= cell_bit
+            if value:
+                self.filled_count += 1
+            else:
+                count_buckets[popcount(cands)] |= cell_bit
+            changed = cands ^ candidates[cell]
+            while changed:
+                low = changed & -changed
+                digit_cells[low.bit_length() - 1] ^= cell_bit
+                changed ^= low
+
+            grid[cell] = value
+            candidates[cell] = cands
+            touched |= cell_unit_mask[cell]
+
+        if touched:
+            self.mark_units_dirty(touched)
+
+    def mark_units_dirty(self, unit_mask: Mask):
+        dirty_units = self.dirty_units
+        for consumer in dirty_units:
+            dirty_units[consumer] |= unit_mask
+
+    def pop_dirty_units(self, consumer: str) -> Mask:
+        """Get units that changed since the last call by the same consumer and reset them.
+
+        A consumer that asks for the first time gets all units.
+
+        :param consumer: name of whoever tracks the changes, usually a technique
+        :return: bitmask of unit ids, see `Geometry.units`
+        """
+        unit_mask = self.dirty_units.get(consumer, self.geometry.all_units_mask)
+        self.dirty_units[consumer] = 0
+        return unit_mask
 
     def count_cells(self) -> int:
-        return len([x for row in self.grid for x in row if x > 0])
+        return self.filled_count
 
-    def check_if_solved(self) -> bool:
-        if not self._is_solved:
-            status = all(x for row in self.grid for x in row)
-            self._is_solved = status
-            return status
+    def has_valid_clues(self) -> bool:
+        # No value is repeated within a unit, empty cells don't count
+        grid = self.grid
+        for unit in self.units:
+            values = [grid[cell] for cell in unit if grid[cell]]
+            if len(values) != len(set(values)):
+                return False
+
+        return True
 
-        return self._is_solved
+    def count_candidates(self) -> int:
+        return sum(map(int.bit_count, self.candidates))
+
+    def check_if_solved(self) -> bool:
+        return self.filled_count == self.geometry.cell_count
 
     def get_puzzle_string(self) -> str:
-        return ''.join(str(x) for row in self.grid for x in row)
+        return grid_to_symbols(self.grid)
 
     def copy_puzzle_string(self):
         # this should get moved to the future Game class
+        import pyperclip
         pyperclip.copy(self.get_puzzle_string())
         print('Copied the puzzle string')
 
-    def get_all_candidates(self) -> List[List[NumSet]]:
-        candidates = []
-        for y in range(self.size):
-            candidates.append([])
-            for x in range(self.size):
-                if self.grid[y][x] == 0:
-                    cands = self.get_candidates_for_cell(x, y)
-                else:
-                    cands = set()
-
-                candidates[y].append(cands)
-
-        return candidates
-
-    def get_box_base_index(self, x: int, y: int) -> Tuple[int, int]:
-        return get_box_base_index(self.box_size, x, y)
-
-    def get_row_indices(self, _x: int, y: int) -> IndexSet:
-        return get_row_indices(self.size, y)
-
-    def get_column_indices(self, x: int, _y: int) -> IndexSet:
-        return get_column_indices(self.size, x)
-
-    def get_box_indices(self, x: int, y: int) -> IndexSet:
-        return get_box_indices(self.box_size, x, y)
-
-    def get_rcb_indices(self, x: int, y: int) -> IndexSet:
-        # Get a combined set of indices from row, column and box
-        return get_rcb_indices(self.size, self.box_size, x, y)
-
-    def get_row(self, x: int, y: int) -> NumSet:
-        return set(self.grid[j][i] for i, j in self.get_row_indices(x, y))
-
-    def get_column(self, x: int, y: int) -> NumSet:
-        return set(self.grid[j][i] for i, j in self.get_column_indices(x, y))
-
-    def get_box(self, x: int, y: int) -> NumSet:
-        return set(self.grid[j][i] for i, j in self.get_box_indices(x, y))
-
-    def get_rcb(self, x: int, y: int) -> NumSet:
+    def get_rows(self) -> List[List[int]]:
+        return [self.grid[i:i + self.size] for i in range(0, self.geometry.cell_count, self.size)]
+
+    def cell_name(self, cell: int) -> str:
+        return convert_cell(cell, self.size)
+
+    def get_all_candidates(self) -> List[Mask]:
+        # Values placed in every unit first, so that each cell only combines the masks of its three units
+        grid = self.grid
+        cell_units = self.geometry.cell_units
+        unit_values = [0] * len(self.units)
+        for value, (row, column, box) in zip(grid, cell_units):
+            if value:
+                bit = 1 << (value - 1)
+                unit_values[row] |= bit
+                unit_values[column] |= bit
+                unit_values[box] |= bit
+
+        all_possible_values = self.all_possible_values
+        return [all_possible_values & ~(unit_values[row] | unit_values[column] | unit_values[box]) if not value else 0
+                for value, (row, column, box) in zip(grid, cell_units)]
+
+    def get_rcb(self, cell: int) -> NumSet:
         # Get a combined set of values from row, column and box
-        return set(self.grid[j][i] for i, j in self.get_rcb_indices(x, y))
-
-    def get_candidates_for_cell(self, x: int, y: int) -> NumSet:
-        return self.all_possible_values - self.get_rcb(x, y)
-
-    def get_all_row_indices(self) -> List[IndexSet]:
-        return get_all_row_indices(self.size)
-
-    def get_all_column_indices(self) -> List[IndexSet]:
-        return get_all_column_indices(self.size)
+        grid = self.grid
+        return {grid[peer] for peer in self.peers[cell]}
 
-    def get_all_box_indices(self) -> List[IndexSet]:
-        return get_all_box_indices(self.size, self.box_size)
+    def get_candidates_for_cell(self, cell: int) -> Mask:
+        return self.all_possible_values & ~values_to_mask(self.get_rcb(cell))
 
-    def get_all_group_indices(self) -> List[IndexSet]:
-        return get_all_group_indices(self.size, self.box_size)
+    def get_all_row_indices(self) -> List[Cells]:
+        return list(self.geometry.rows)
 
-    def get_all_rows(self) -> List[NumSet]:
-        return [set(self.grid[y][x] for x, y in row) for row in self.get_all_row_indices()]
+    def get_all_column_indices(self) -> List[Cells]:
+        return list(self.geometry.columns)
 
-    def get_all_columns(self) -> List[NumSet]:
-        return [set(self.grid[y][x] for x, y in row) for row in self.get_all_column_indices()]
+    def get_all_box_indices(self) -> List[Cells]:
+        return list(self.geometry.boxes)
 
-    def get_all_boxes(self) -> List[NumSet]:
-        return [set(self.grid[y][x] for x, y in row) for row in self.get_all_box_indices()]
+    def get_all_group_indices(self) -> List[Cells]:
+        return list(self.units)
 
     def validate_solution(self) -> bool:
-        all_groups = self.get_all_rows() + self.get_all_columns() + self.get_all_boxes()
-        return all(len(group) == self.size for group in all_groups)
+        grid = self.grid
+        return all(len({grid[cell] for cell in unit} - {0}) == self.size for unit in self.units)
 
     def fancy_display(self) -> str:
-        # todo make it work for 4x4 and figure out what to do with 16x16
+        # todo make big digits work for 4x4
+        if self.size != 9:
+            return self.simple_display()
+
         big_digits = (
             ('  |', '  |'),
             ('|_', ' _|', ' _'),
@@ -306,78 +395,222 @@ class Puzzle:
 
             return grid
 
-        for j, row in enumerate(self.candidates):
-            for i, cands in enumerate(row):
-                pos_x = 1 + i * 8
-                pos_y = 2 + j * 4
-                if not cands:
-                    if self.grid[j][i] != 0:
-                        value = big_digits[self.grid[j][i] - 1]
-                        insert_lines(vgrid, pos_x, pos_y, value)
-                else:
-                    digitline = ''.join(x if int(x) in cands else ' ' for x in '789456123')
-                    digitlines = [digitline[:3], digitline[3:6], digitline[6:]]
-                    insert_lines(vgrid, pos_x, pos_y, digitlines)
+        for cell, cands in enumerate(self.candidates):
+            j, i = divmod(cell, self.size)
+            pos_x = 1 + i * 8
+            pos_y = 2 + j * 4
+            if not cands:
+                if self.grid[cell] != 0:
+                    value = big_digits[self.grid[cell] - 1]
+                    insert_lines(vgrid, pos_x, pos_y, value)
+            else:
+                digitline = ''.join(x if cands & value_to_bit(int(x)) else ' ' for x in '789456123')
+                digitlines = [digitline[:3], digitline[3:6], digitline[6:]]
+                insert_lines(vgrid, pos_x, pos_y, digitlines)
 
         return '\n'.join(line for line in vgrid)
 
-    def assign_value_to_cell(self, value: int, x: int, y: int):
-        if cfg.solve_output_enabled:
-            print(f'  found {value} at position {convert_index(x, y)}')
-
-        self.grid[y][x] = value
-        self.remove_candidate_from_rcb(value, x, y)
-        self.candidates[y][x] = set()
-
-    def remove_candidate_from_rcb(self, candidate: int, x: int, y: int):
-        for i, j in self.get_rcb_indices(x, y):
-            self.candidates[j][i].discard(candidate)
-
-    def find_cell_with_fewest_candidates(self) -> Tuple[int, int]:
-        min_cands = self.size
-        min_x = 0
-        min_y = 0
-
-        for y, row in enumerate(self.candidates):
-            for x, cands in enumerate(row):
-                length = len(cands)
-                if length != 0:
-                    if length == 2:
-                        return x, y
-
-                    if length < min_cands:
-                        min_cands = length
-                        min_x = x
-                        min_y = y
-
-        return min_x, min_y
+    def simple_display(self) -> str:
+        # One character per cell, `.` for unknown ones, boxes separated by lines. Works for every size.
+        box_size = self.box_size
+        box_separator = '+'.join('-' * (2 * box_size + 1) for _ in range(box_size))
+        lines = []
+        for y, row in enumerate(self.get_rows()):
+            if y and y % box_size == 0:
+                lines.append(box_separator)
+            boxes = [' '.join(symbols[value] if value else '.' for value in row[x:x + box_size])
+                     for x in range(0, self.size, box_size)]
+            lines.append(' ' + ' | '.join(boxes) + ' ')
+
+        return '\n'.join(line.rstrip() for line in lines)
+
+    def assign_value_to_cell(self, value: int, cell: int):
+        if self.tracer is not None:
+            self.tracer.emit(TraceEvent('placement', value=value, cell=cell, cell_name=self.cell_name(cell)))
+
+        if self.trail is not None:
+            self.trail.append((cell, self.grid[cell], self.candidates[cell]))
+
+        if not self.grid[cell]:
+            cands = self.candidates[cell]
+            cell_bit = self.geometry.cell_bit[cell]
+            count = cands.bit_count()
+            self.count_buckets[count] ^= cell_bit
+            self.filled_count += 1
+            # The placed value's own candidate is counted with the peers' in `remove_candidate_from_rcb`
+            self.removed_count += count - (cands >> (value - 1) & 1)
+            # The placed digit leaves `digit_cells` along with the peers' in `remove_candidate_from_rcb`
+            digit_cells = self.digit_cells
+            others = cands & ~(1 << (value - 1))
+            while others:
+                low = others & -others
+                digit_cells[low.bit_length() - 1] ^= cell_bit
+                others ^= low
+
+        self.grid[cell] = value
+        self.remove_candidate_from_rcb(value, cell)
+        self.candidates[cell] = 0
+        if self.auto_propagate and not self.propagating:
+            self.propagate()
+
+    def remove_candidate_from_rcb(self, candidate: int, cell: int):
+        bit = value_to_bit(candidate)
+        candidates = self.candidates
+        trail = self.trail
+        count_buckets = self.count_buckets
+        cell_unit_mask = self.geometry.cell_unit_mask
+        touched = cell_unit_mask[cell]
+        # Only the peers that still have the candidate, the cell itself loses it too
+        digit = candidate - 1
+        peers = self.digit_cells[digit] & self.geometry.peer_masks[cell]
+        self.removed_count += peers.bit_count() + (candidates[cell] >> digit & 1)
+        self.digit_cells[digit] &= ~(peers | self.geometry.cell_bit[cell])
+        while peers:
+            peer_bit = peers & -peers
+            peer = peer_bit.bit_length() - 1
+            cands = candidates[peer]
+            if trail is not None:
+                trail.append((peer, 0, cands))
+            candidates[peer] = cands ^ bit
+            count = cands.bit_count()
+            count_buckets[count] ^= peer_bit
+            count_buckets[count - 1] |= peer_bit
+            touched |= cell_unit_mask[peer]
+            peers ^= peer_bit
+
+        self.mark_units_dirty(touched)
+
+    def find_cell_with_fewest_candidates(self) -> int:
+        # First unsolved cell with two candidates, otherwise the first one with the fewest, 0 if none is left
+        count_buckets = self.count_buckets
+        cells = count_buckets[2] or next((cells for cells in count_buckets[1:] if cells), 0)
+        return (cells & -cells).bit_length() - 1 if cells else 0
+
+    def find_value_with_fewest_places(self, limit: int) -> Tuple[int, Mask]:
+        """Find a value with the fewest places left in one of the units.
+
+        Together with `find_cell_with_fewest_candidates` this gives the exact cover constraint
+        with the fewest options: a cell has to get some value, and a unit has to get every value.
+
+        :param limit: only fewer places than this are of interest, e.g. the candidate count of the best cell
+        :return: the value and its places in that unit as a cell bitmask, (0, 0) if no value has fewer than `limit`
+        """
+        best_value = 0
+        best_cells = 0
+        best_count = limit
+        unit_masks = self.geometry.unit_masks
+        for digit, digit_cells in enumerate(self.digit_cells):
+            if not digit_cells:
+                continue
+
+            for unit_mask in unit_masks:
+                cells = digit_cells & unit_mask
+                if cells and (count := cells.bit_count()) < best_count:
+                    best_value, best_cells, best_count = digit + 1, cells, count
+                    # One place would be a hidden single, two is the fewest a search can get
+                    if count <= 2:
+                        return best_value, best_cells
+
+        return best_value, best_cells
 
     def is_impossible(self) -> bool:
-        return any(self.grid[y][x] == 0 and len(self.candidates[y][x]) == 0
-                   for y in range(self.size) for x in range(self.size))
-
-    def get_candidates_counter(self, group: IndexSet) -> Counter:
-        return Counter(cand_value for x, y in group for cand_value in self.candidates[y][x])
+        return self.count_buckets[0] != 0
+
+    def get_candidates_counter(self, group: Iterable[int]) -> Counter:
+        return Counter(cand_value for cell in group for cand_value in iter_values(self.candidates[cell]))
+
+    def get_candidates_indices_by_value(self, value: int, group: Iterable[int]) -> List[int]:
+        bit = value_to_bit(value)
+        candidates = self.candidates
+        return [cell for cell in group if candidates[cell] & bit]
+
+    def get_candidates_indices_by_exact_candidates(self, cands: Mask, group: Iterable[int]) -> List[int]:
+        candidates = self.candidates
+        return [cell for cell in group if cands == candidates[cell]]
+
+    def remove_candidate_from_group(self, candidate_value: int, group: Iterable[int]) -> bool:
+        bit = value_to_bit(candidate_value)
+        candidates = self.candidates
+        cell_bit = self.geometry.cell_bit
+        cell_unit_mask = self.geometry.cell_unit_mask
+        trail = self.trail
+        tracer = self.tracer
+        if tracer is not None:
+            group = tuple(group)
+            cells = [cell for cell in group if candidates[cell] & bit]
+            if cells:
+                tracer.emit(TraceEvent('elimination', value=candidate_value, cells=cells,
+                                       cell_names=[self.cell_name(cell) for cell in cells]))
+
+        # Every cell is in some unit, so nothing got touched only if nothing got removed
+        count_buckets = self.count_buckets
+        touched = 0
+        removed = 0
+        for cell in group:
+            cands = candidates[cell]
+            if cands & bit:
+                if trail is not None:
+                    trail.append((cell, 0, cands))
+                candidates[cell] = cands ^ bit
+                count = cands.bit_count()
+                count_buckets[count] ^= cell_bit[cell]
+                count_buckets[count - 1] |= cell_bit[cell]
+                removed |= cell_bit[cell]
+                touched |= cell_unit_mask[cell]
+
+        if touched:
+            self.digit_cells[candidate_value - 1] ^= removed
+            self.removed_count += removed.bit_count()
+            self.mark_units_dirty(touched)
+            if self.auto_propagate and not self.propagating:
+                self.propagate()
+            return True
 
-    def get_candidates_indices_by_value(self, value: int, group: IndexSet) -> IndexSet:
-        return {(x, y) for x, y in group if value in self.candidates[y][x]}
+        return False
 
-    def get_candidates_indices_by_exact_candidates(self, cands: NumSet, group: IndexSet) -> IndexSet:
-        return {(x, y) for x, y in group if cands == self.candidates[y][x]}
+    def propagate(self) -> bool:
+        """Place naked and hidden singles until there are none left or the puzzle turns out impossible.
 
-    def remove_candidate_from_group(self, candidate_value: int, group: IndexSet) -> bool:
-        cells = []
-        for x, y in group:
-            if candidate_value in self.candidates[y][x]:
-                self.candidates[y][x].discard(candidate_value)
-                cells.append((x, y))
+        Works off what changed instead of sweeping the grid. Cells are queued by dropping
+        to a single candidate (`count_buckets[1]`), units by losing a candidate anywhere in them
+        (their dirty units as the `propagate` consumer). Naked singles go first, then hidden
+        singles of the queued units, until both queues are empty.
 
-        if len(cells) > 0:
-            if cfg.solve_output_enabled:
-                print(f"  removed candidate {candidate_value} from {', '.join(convert_index(x, y) for x, y in cells)}")
-            return True
+        :return: whether anything was placed
+        """
+        if self.propagating:
+            return False
 
-        return False
+        self.propagating = True
+        try:
+            is_progress = False
+            candidates = self.candidates
+            count_buckets = self.count_buckets
+            digit_cells = self.digit_cells
+            unit_masks = self.geometry.unit_masks
+            while not count_buckets[0]:
+                if singles := count_buckets[1]:
+                    cell = (singles & -singles).bit_length() - 1
+                    self.assign_value_to_cell(candidates[cell].bit_length(), cell)
+                    is_progress = True
+                    continue
+
+                queued_units = self.pop_dirty_units('propagate')
+                if not queued_units:
+                    break
+
+                for unit_id in iter_indices(queued_units):
+                    unit_mask = unit_masks[unit_id]
+                    for digit, cells in enumerate(digit_cells):
+                        # A digit with a single place left in the unit goes there
+                        places = cells & unit_mask
+                        if places and not places & (places - 1):
+                            self.assign_value_to_cell(digit + 1, places.bit_length() - 1)
+                            is_progress = True
+
+            return is_progress
+        finally:
+            self.propagating = False
 
 
 if __name__ == '__main__':
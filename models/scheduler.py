@@ -0,0 +1,149 @@
+from typing import Dict, List, Sequence, Tuple, Type
+
+from models.puzzle import Puzzle
+from models.tech.base_tech import BaseTechnique
+
+
+class SchedulingPolicy:
+    """Decides which techniques a logical solve tries, and in which order.
+
+    The solver applies its high priority techniques (singles) repeatedly until they get
+    stuck, then asks the policy for the order of the normal priority tier, and of the low
+    priority tier if the normal one made no progress. A policy may leave techniques out
+    of an order; they are not tried at that step.
+
+    A policy belongs to one solver. Worker processes get a copy of it.
+    """
+    # Go back to the high priority techniques as soon as one technique of a tier made progress,
+    # and to the first high priority technique as soon as one of those did
+    stop_on_progress = False
+    # Have the solver time every technique call of the tiers and report it with `record`
+    measures = False
+
+    def order(self, puzzle: Puzzle, techniques: Sequence[BaseTechnique]) -> Sequence[BaseTechnique]:
+        return techniques
+
+    def record(self, technique: BaseTechnique, elapsed: float, eliminations: int):
+        pass
+
+
+class FixedOrderPolicy(SchedulingPolicy):
+    def __init__(self, stop_on_progress: bool = False):
+        """Every technique of a tier in the solver's order, every time. Solves are reproducible
+        and the same techniques run no matter what came before, this is the default.
+
+        :param stop_on_progress: go back to the high priority techniques after the first technique
+            of a tier that made progress, instead of trying the rest of the tier as well
+        """
+        self.stop_on_progress = stop_on_progress
+
+
+class TechniqueEstimate:
+    def __init__(self):
+        """Running numbers of one technique in one phase of a solve, older calls weigh less."""
+        # Every call, not decayed, for the warmup
+        self.calls = 0
+        self.uses = 0.0
+        self.successes = 0.0
+        self.time = 0.0
+        self.eliminations = 0.0
+        # Times the technique was left out since it was last tried
+        self.skipped = 0
+
+    def add(self, elapsed: float, eliminations: int, decay: float):
+        self.calls += 1
+        self.uses = self.uses * decay + 1
+        self.successes = self.successes * decay + (eliminations > 0)
+        self.time = self.time * decay + elapsed
+        self.eliminations = self.eliminations * decay + eliminations
+
+    def cost_per_elimination(self) -> float:
+        if not self.eliminations:
+            return float('inf')
+
+        return self.time / self.eliminations
+
+
+class AdaptivePolicy(SchedulingPolicy):
+    stop_on_progress = True
+    measures = True
+
+    def __init__(self, phases: int = 4,
+                 warmup: int = 20,
+                 min_success_rate: float = 0.02,
+                 explore_every: int = 16,
+                 decay: float = 0.99):
+        """Orders techniques by how much time they took per removed candidate so far.
+
+        Estimates are kept separately for every grid size and phase of a solve, phases
+        are equal ranges of the share of empty cells. A technique that hasn't been tried
+        `warmup` times in a phase goes first. After that, techniques run cheapest first
+        and the tier stops at the first one that makes progress, so expensive techniques
+        only run when the cheap ones are stuck. A technique that succeeds in less than
+        `min_success_rate` of its calls is left out, except for every `explore_every`-th
+        time, so that its estimate follows changes in the workload.
+
+        Different orders can lead to different eliminations, so the number of brute force
+        branches and the solve path may change from run to run. Solutions are the same.
+
+        :param phases: number of phases a solve is split into
+        :param warmup: calls before a technique's estimate is trusted
+        :param min_success_rate: success rate below which a technique is skipped
+        :param explore_every: a skipped technique is still tried once in this many steps
+        :param decay: weight of the previous estimate on every new call, between 0 and 1
+        """
+        if not 0 < decay < 1:
+            raise ValueError(f'Invalid decay: should be between 0 and 1, but it\'s {decay}')
+        if warmup < 0:
+            raise ValueError(f'Invalid warmup: should not be negative, but it\'s {warmup}')
+
+        self.phases = phases
+        self.warmup = warmup
+        self.min_success_rate = min_success_rate
+        self.explore_every = explore_every
+        self.decay = decay
+
+        # Estimates by grid size and phase, then by technique name
+        self.estimates: Dict[Tuple[int, int], Dict[str, TechniqueEstimate]] = {}
+        # Estimates of the phase the puzzle was in at the last `order`
+        self.current: Dict[str, TechniqueEstimate] = {}
+
+    def get_phase(self, puzzle: Puzzle) -> int:
+        cell_count = puzzle.geometry.cell_count
+        empty_cells = cell_count - puzzle.count_cells()
+        return min(empty_cells * self.phases // cell_count, self.phases - 1)
+
+    def order(self, puzzle: Puzzle, techniques: Sequence[BaseTechnique]) -> List[BaseTechnique]:
+        key = (puzzle.size, self.get_phase(puzzle))
+        if key not in self.estimates:
+            self.estimates[key] = {}
+        current = self.current = self.estimates[key]
+
+        ordered = []
+        for tech in techniques:
+            name = tech.__class__.__name__
+            if name not in current:
+                current[name] = TechniqueEstimate()
+
+            estimate = current[name]
+            if estimate.calls < self.warmup:
+                ordered.append((-1.0, tech))
+            elif estimate.successes < self.min_success_rate * estimate.uses and estimate.skipped < self.explore_every:
+                estimate.skipped += 1
+            else:
+                ordered.append((estimate.cost_per_elimination(), tech))
+
+        # Stable, so ties keep the solver's order
+        ordered.sort(key=lambda item: item[0])
+        return [tech for _, tech in ordered]
+
+    def record(self, technique: BaseTechnique, elapsed: float, eliminations: int):
+        estimate = self.current[technique.__class__.__name__]
+        estimate.add(elapsed, eliminations, self.decay)
+        estimate.skipped = 0
+
+
+policies: Dict[str, Type[SchedulingPolicy]] = {
+    'fixed': FixedOrderPolicy,
+    'adaptive': AdaptivePolicy,
+}
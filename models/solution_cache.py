@@ -0,0 +1,139 @@
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from models.canonical import CanonicalForm, canonicalize, identity_form
+from models.encoding import grid_to_symbols, symbols_to_grid
+from models.puzzle import Puzzle
+
+# Bigger puzzles have too many transforms (28800 for 25x25), they're only cached as they are
+canonical_max_size = 16
+
+
+def get_form(puzzle: Puzzle) -> CanonicalForm:
+    if puzzle.size > canonical_max_size:
+        return identity_form(puzzle.grid, puzzle.size)
+
+    return canonicalize(puzzle.grid, puzzle.size)
+
+
+class SolutionCache:
+    def __init__(self, capacity: int = 100_000, path: Optional[Union[str, Path]] = None,
+                 commit_interval: int = 100):
+        """Bounded LRU cache of solutions keyed on the canonical form of puzzles.
+
+        A puzzle that is a relabeling, band/stack swap or transposition of a cached one is
+        answered by mapping the cached solution back through the inverse transform.
+        Exact repeats skip canonicalization altogether.
+
+        With `path` the cache is also backed by an SQLite file: misses in memory fall back
+        to the file and new solutions are written to it, committing every `commit_interval`
+        new entries and on `close`.
+
+        :param capacity: max number of canonical entries kept in memory
+        :param path: optional file for the persistent store
+        :param commit_interval: how many new entries to write before committing
+        """
+        self.capacity = capacity
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        # Exact puzzle string -> solution string, bounded by the same capacity
+        self.exact: OrderedDict[str, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection: Optional[sqlite3.Connection] = None
+        self.commit_interval = commit_interval
+        self.pending_writes = 0
+        if path is not None:
+            self.connection = sqlite3.connect(path)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, solution TEXT)')
+
+    def __enter__(self) -> 'SolutionCache':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    @staticmethod
+    def _remember(entries: OrderedDict, key: str, value: str, capacity: int):
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > capacity:
+            entries.popitem(last=False)
+
+    def _get_canonical(self, key: str) -> Optional[str]:
+        solution = self.entries.get(key)
+        if solution is not None:
+            self.entries.move_to_end(key)
+            return solution
+
+        if self.connection is not None:
+            row = self.connection.execute('SELECT solution FROM solutions WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._remember(self.entries, key, row[0], self.capacity)
+                return row[0]
+
+        return None
+
+    def get(self, puzzle: Puzzle) -> Optional[List[int]]:
+        """Look up a solution for the puzzle.
+
+        :param puzzle: puzzle to look up, it is not modified
+        :return: flat solved grid or None if nothing equivalent was cached
+        """
+        return self.lookup(puzzle)[0]
+
+    def lookup(self, puzzle: Puzzle) -> Tuple[Optional[List[int]], Optional[CanonicalForm]]:
+        """Look up a solution for the puzzle, also giving the canonical form if one was computed.
+
+        Pass the form on to `put` after a miss, so that the puzzle isn't canonicalized twice.
+
+        :param puzzle: puzzle to look up, it is not modified
+        :return: flat solved grid or None, and the canonical form or None for exact repeats
+        """
+        puzzle_key = grid_to_symbols(puzzle.grid)
+        solution = self.exact.get(puzzle_key)
+        if solution is not None:
+            self.exact.move_to_end(puzzle_key)
+            self.hits += 1
+            return symbols_to_grid(solution), None
+
+        form = get_form(puzzle)
+        canonical_solution = self._get_canonical(form.key)
+        if canonical_solution is None:
+            self.misses += 1
+            return None, form
+
+        self.hits += 1
+        grid = form.from_canonical(symbols_to_grid(canonical_solution))
+        self._remember(self.exact, puzzle_key, grid_to_symbols(grid), self.capacity)
+        return grid, form
+
+    def put(self, puzzle: Puzzle, solution: List[int], form: Optional[CanonicalForm] = None):
+        """Cache the solution of a puzzle.
+
+        :param puzzle: the puzzle as it was before solving
+        :param solution: its flat solved grid
+        :param form: canonical form of the puzzle from `lookup`, computed here if omitted
+        """
+        puzzle_key = grid_to_symbols(puzzle.grid)
+        self._remember(self.exact, puzzle_key, grid_to_symbols(solution), self.capacity)
+
+        if form is None:
+            form = get_form(puzzle)
+        canonical_solution = grid_to_symbols(form.to_canonical(solution))
+        self._remember(self.entries, form.key, canonical_solution, self.capacity)
+
+        if self.connection is not None:
+            self.connection.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?)', (form.key, canonical_solution))
+            self.pending_writes += 1
+            if self.pending_writes >= self.commit_interval:
+                self.connection.commit()
+                self.pending_writes = 0
@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple, Union
+
+import config as cfg
+from models.puzzle import Puzzle
+from models.sudoku_solver import SolveResult, SudokuSolver
+
+# Puzzle string waiting in the queue and the future its result goes to
+Request = Tuple[str, asyncio.Future]
+# What a worker returns for every puzzle of a batch, invalid puzzle strings get their error
+WorkerResult = Union[SolveResult, ValueError]
+
+
+class SolveService:
+    def __init__(self, workers: int = 1,
+                 search_mode: str = 'copy',
+                 batch_size: int = 64,
+                 batch_delay: float = 0.002,
+                 max_queued: int = 1024,
+                 timeout: Optional[float] = None):
+        """Asyncio front end for solving puzzles in a pool of worker processes.
+
+        Requests go into a bounded queue. A batcher takes them out in micro-batches:
+        everything that's queued up to `batch_size`, waiting at most `batch_delay` for more
+        when the queue runs short. Batches are solved by `SudokuSolver` in worker processes,
+        so the event loop only moves strings around. At most `2 * workers` batches are in
+        flight; once they are all busy the queue fills up and `solve` waits for a free slot,
+        which pushes back on callers and socket clients.
+
+        A request that times out is dropped if it's still queued. If its batch is already
+        being solved, the worker finishes it and the result is thrown away.
+
+        Use it in process with `solve`, or serve it over a socket with `start_server`.
+
+        :param workers: number of worker processes
+        :param search_mode: passed to `SudokuSolver`
+        :param batch_size: max number of puzzles in a batch
+        :param batch_delay: how long to wait for more requests before dispatching a short batch, in seconds
+        :param max_queued: max number of requests waiting for a batch
+        :param timeout: default per-request timeout in seconds, None waits forever
+        """
+        if search_mode not in SudokuSolver.search_modes:
+            raise ValueError(f'Invalid search mode: should be one of {SudokuSolver.search_modes}, '
+                             f'but it\'s {search_mode}')
+
+        self.workers = workers
+        self.search_mode = search_mode
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_queued = max_queued
+        self.timeout = timeout
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.batch_slots: Optional[asyncio.Semaphore] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.batcher: Optional[asyncio.Task] = None
+        self.in_flight: Set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> 'SolveService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def start(self):
+        self.queue = asyncio.Queue(self.max_queued)
+        self.batch_slots = asyncio.Semaphore(2 * self.workers)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.search_mode,))
+        # Fork the workers before anyone connects: forked later, they would inherit the sockets of
+        # the clients connected by then, and those clients would never see their connection close
+        await asyncio.get_running_loop().run_in_executor(self.executor, _ping)
+        self.batcher = asyncio.create_task(self._run_batcher())
+
+    async def close(self):
+        # Batches in flight are finished, requests still in the queue are cancelled
+        self.batcher.cancel()
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+
+        if self.in_flight:
+            await asyncio.wait(self.in_flight)
+
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+    async def solve(self, puzzle_string: str, timeout: Optional[float] = None) -> SolveResult:
+        """Solve one puzzle in the worker pool.
+
+        :param puzzle_string: puzzle to solve
+        :param timeout: seconds to wait for the result, including time in the queue,
+            the service default if omitted
+        :return: (is solved, final puzzle string)
+        :raises asyncio.TimeoutError: if the result didn't come in time
+        :raises ValueError: if the puzzle string is invalid
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        return await asyncio.wait_for(self._submit(puzzle_string), timeout)
+
+    async def _submit(self, puzzle_string: str) -> SolveResult:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((puzzle_string, future))
+        return await future
+
+    async def _run_batcher(self):
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.batch_delay)
+
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            # Requests that timed out while queued are not worth solving
+            batch = [request for request in batch if not request[1].done()]
+            if not batch:
+                continue
+
+            await self.batch_slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def _dispatch(self, batch: List[Request]):
+        try:
+            loop = asyncio.get_running_loop()
+            puzzle_strings = [puzzle_string for puzzle_string, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, _solve_batch, puzzle_strings)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, ValueError):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self.batch_slots.release()
+
+    async def start_server(self, path: Optional[str] = None,
+                           host: str = '127.0.0.1',
+                           port: Optional[int] = None) -> asyncio.AbstractServer:
+        """Serve the service over a Unix socket at `path`, or over TCP if `port` is given.
+
+        Clients send puzzle strings, one per line, and may keep sending without waiting.
+        Every puzzle gets a line `<puzzle string> <status> <detail>` as soon as it's done,
+        so answers can come out of order. Status is `solved` or `unsolved` with the final
+        puzzle string, `timeout` with `-`, or `error` with the error message, for invalid
+        puzzle strings as well as for failures of the worker pool. A client with
+        `max_queued` puzzles unanswered is not read from until some are answered.
+        """
+        if port is not None:
+            return await asyncio.start_server(self.handle_connection, host, port)
+
+        return await asyncio.start_unix_server(self.handle_connection, path)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        slots = asyncio.Semaphore(self.max_queued)
+        write_lock = asyncio.Lock()
+        answers: Set[asyncio.Task] = set()
+        try:
+            async for line in reader:
+                puzzle_string = line.decode().strip()
+                if not puzzle_string:
+                    continue
+
+                await slots.acquire()
+                task = asyncio.create_task(self._answer(puzzle_string, writer, write_lock, slots))
+                answers.add(task)
+                task.add_done_callback(answers.discard)
+
+            if answers:
+                await asyncio.wait(answers)
+        finally:
+            writer.close()
+
+    async def _answer(self, puzzle_string: str, writer: asyncio.StreamWriter,
+                      write_lock: asyncio.Lock, slots: asyncio.Semaphore):
+        try:
+            try:
+                is_solved, puzzle_state = await self.solve(puzzle_string)
+                answer = f"{'solved' if is_solved else 'unsolved'} {puzzle_state}"
+            except asyncio.TimeoutError:
+                answer = 'timeout -'
+            except Exception as e:
+                # Invalid puzzle strings, but also whatever the pool raises, e.g. when a worker dies.
+                # The client gets a line either way, on a single line.
+                answer = f"error {' '.join(str(e).split()) or type(e).__name__}"
+
+            async with write_lock:
+                writer.write(f'{puzzle_string} {answer}\n'.encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            slots.release()
+
+
+_worker_solver: Optional[SudokuSolver] = None
+
+
+def _init_worker(search_mode: str):
+    global _worker_solver
+    cfg.solve_output_enabled = False
+    _worker_solver = SudokuSolver(search_mode)
+
+
+def _ping():
+    pass
+
+
+def _solve_batch(puzzle_strings: Sequence[str]) -> List[WorkerResult]:
+    # Runs in a worker process, an invalid puzzle string only fails its own request
+    results = []
+    for puzzle_string in puzzle_strings:
+        try:
+            puzzle = Puzzle.from_string(puzzle_string)
+        except ValueError as e:
+            results.append(e)
+            continue
+
+        is_solved = _worker_solver.solve(puzzle)
+        results.append((is_solved, puzzle.get_puzzle_string()))
+
+    return results
+
+
+async def serve(args: argparse.Namespace):
+    service = SolveService(args.workers, args.search_mode, args.batch_size, args.batch_delay,
+                           args.max_queued, args.timeout)
+    async with service:
+        server = await service.start_server(args.socket, port=args.port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Serve the solver over a socket, one puzzle string per line')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--socket', help='path of the Unix socket to listen on')
+    target.add_argument('--port', type=int, help='TCP port to listen on at localhost')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--search-mode', default='copy', choices=SudokuSolver.search_modes)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batch-delay', type=float, default=0.002, help='seconds to wait for a fuller batch')
+    parser.add_argument('--max-queued', type=int, default=1024)
+    parser.add_argument('--timeout', type=float, help='per-request timeout in seconds')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional
+
+# Upper bounds of latency histogram buckets are powers of two in microseconds: <1μs, <2μs, <4μs, ...
+histogram_size = 24
+
+
+class TechniqueStats:
+    def __init__(self):
+        """Aggregated numbers of one technique."""
+        self.total_uses = 0
+        self.successful_uses = 0
+        self.total_time = 0.0
+        self.eliminations = 0
+        self.placements = 0
+        self.histogram = [0] * histogram_size
+
+    def add(self, elapsed: float, is_used: bool, eliminations: int, placements: int):
+        self.total_uses += 1
+        self.successful_uses += is_used
+        self.total_time += elapsed
+        self.eliminations += eliminations
+        self.placements += placements
+        self.histogram[min(int(elapsed * 10 ** 6).bit_length(), histogram_size - 1)] += 1
+
+    def merge(self, other: 'TechniqueStats'):
+        self.total_uses += other.total_uses
+        self.successful_uses += other.successful_uses
+        self.total_time += other.total_time
+        self.eliminations += other.eliminations
+        self.placements += other.placements
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def percentile_us(self, q: float) -> int:
+        # Upper bound of the histogram bucket containing the q-th percentile call
+        target = self.total_uses * q / 100
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return 1 << bucket
+
+        return 0
+
+
+class PuzzleStats:
+    def __init__(self, puzzle_string: str):
+        """Per-technique breakdown of a single solve."""
+        self.puzzle_string = puzzle_string
+        self.is_solved = False
+        self.total_time = 0.0
+        self.techniques: Dict[str, TechniqueStats] = {}
+
+
+class StatsCollector:
+    def __init__(self, per_puzzle: bool = False):
+        """Collects technique stats of a solver.
+
+        Give it to `SudokuSolver` to turn profiling on. Without a collector techniques skip
+        all timing and counting. Every technique call records its latency (into a log2
+        histogram), whether it made progress, and how many candidates it removed and cells
+        it filled. With `per_puzzle` every solve also gets its own breakdown.
+
+        A collector belongs to one solver and is not meant to be shared between threads.
+        Collectors from worker processes are combined with `merge`.
+
+        :param per_puzzle: also keep a `PuzzleStats` for every solved puzzle
+        """
+        self.per_puzzle = per_puzzle
+        self.techniques: Dict[str, TechniqueStats] = {}
+        self.puzzles: List[PuzzleStats] = []
+        self.current_puzzle: Optional[PuzzleStats] = None
+
+    def get(self, tech_name: str) -> TechniqueStats:
+        if tech_name not in self.techniques:
+            self.techniques[tech_name] = TechniqueStats()
+
+        return self.techniques[tech_name]
+
+    def record(self, tech_name: str, elapsed: float, is_used: bool, eliminations: int, placements: int):
+        self.get(tech_name).add(elapsed, is_used, eliminations, placements)
+
+        if self.current_puzzle is not None:
+            puzzle_techniques = self.current_puzzle.techniques
+            if tech_name not in puzzle_techniques:
+                puzzle_techniques[tech_name] = TechniqueStats()
+
+            puzzle_techniques[tech_name].add(elapsed, is_used, eliminations, placements)
+
+    def start_puzzle(self, puzzle_string: str):
+        if self.per_puzzle:
+            self.current_puzzle = PuzzleStats(puzzle_string)
+
+    def end_puzzle(self, is_solved: bool, elapsed: float):
+        if self.current_puzzle is not None:
+            self.current_puzzle.is_solved = is_solved
+            self.current_puzzle.total_time = elapsed
+            self.puzzles.append(self.current_puzzle)
+            self.current_puzzle = None
+
+    def merge(self, other: 'StatsCollector'):
+        for tech_name, tech_stats in other.techniques.items():
+            self.get(tech_name).merge(tech_stats)
+
+        self.puzzles.extend(other.puzzles)
+
+    def reset(self):
+        self.techniques = {}
+        self.puzzles = []
+        self.current_puzzle = None
+
+    def slowest_puzzles(self, count: int = 10) -> List[PuzzleStats]:
+        return sorted(self.puzzles, key=lambda puzzle_stats: puzzle_stats.total_time, reverse=True)[:count]
@@ -1,33 +1,94 @@
-import random
 import time
-from typing import List, TypeVar
+from collections import deque
+from contextlib import ExitStack
+from itertools import chain
+from math import isqrt
+from pathlib import Path
+from typing import (TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Type, TypeVar,
+                    Union)
 
 import config as cfg
-from models.puzzle import Puzzle, convert_index
+from models.batch_io import (Source, is_packed_path, iter_chunks, read_puzzle_strings, sample_puzzle_string,
+                             write_line)
+from models.bitmask import iter_indices, iter_values
+from models.puzzle import Puzzle
+from models.scheduler import FixedOrderPolicy, SchedulingPolicy
+from models.stats import StatsCollector
 from models.tech.base_tech import BaseTechnique
+from models.tech.fish import Fish
 from models.tech.hidden_single import HiddenSingle
 from models.tech.hidden_subset import HiddenSubset
 from models.tech.locked_candidates import LockedCandidatesOnLine
 from models.tech.locked_candidates_in_box import LockedCandidatesInBox
 from models.tech.naked_subset import NakedSubset
 from models.tech.single_candidate import SingleCandidate
-from models.tech.x_wing import XWing
+from models.trace import TraceEvent, Tracer, console
+
+# Modules that are only needed by some modes are imported where they're used, which keeps
+# the startup of short-lived processes fast
+if TYPE_CHECKING:
+    from models.packed_batch import PackedBatch
+    from models.solution_cache import SolutionCache
 
 Technique = TypeVar('Technique', bound=BaseTechnique)
 
+# Every technique by class name, in the order the solver lists them
+known_techniques: Dict[str, Type[Technique]] = {tech.__name__: tech for tech in (
+    SingleCandidate,
+    HiddenSingle,
+    NakedSubset,
+    LockedCandidatesOnLine,
+    HiddenSubset,
+    LockedCandidatesInBox,
+    Fish,
+)}
+
+# Whether the puzzle got solved and its final puzzle string
+SolveResult = Tuple[bool, str]
+# Results, technique stats and bruteforce count of a chunk solved in a worker process
+ChunkOutput = Tuple[List[SolveResult], Optional[StatsCollector], int]
+
 
 class SudokuSolver:
     batches_path = cfg.root / 'puzzles/batches'
-
-    def __init__(self):
-        self.tech_classes = (
+    search_modes = ('copy', 'trail', 'dlx')
+
+    def __init__(self, search_mode: str = 'copy', stats: Optional[StatsCollector] = None,
+                 cache: Optional['SolutionCache'] = None,
+                 tech_classes: Optional[Sequence[Type[Technique]]] = None,
+                 tracer: Optional[Tracer] = None,
+                 policy: Optional[SchedulingPolicy] = None):
+        """Solves puzzles with logical techniques, falling back to brute force search.
+
+        Search modes:
+
+        - `copy`: every branch of the search is a separate copy of the puzzle
+        - `trail`: branches are explored on one puzzle, changes are recorded and rolled back on failure
+        - `dlx`: same as `trail`, but branches on the exact cover constraint with the fewest options,
+          a cell or the places of a value in a unit, see `get_branch_placements`
+
+        :param search_mode: how brute force explores branches, one of `search_modes`
+        :param stats: collector for technique profiling, nothing is measured without it
+        :param cache: solutions of equivalent puzzles are taken from it and new ones stored in it.
+            Only used in this process, worker processes solve without a cache
+        :param tech_classes: techniques to use instead of the default set, they keep their priority tier
+        :param tracer: receives every step of a solve, see `models.trace`. Without it steps are
+            printed if `solve_output_enabled` is on, and not even created otherwise
+        :param policy: decides the order of the normal and low priority techniques, see `models.scheduler`.
+            `FixedOrderPolicy` if omitted
+        """
+        if search_mode not in self.search_modes:
+            raise ValueError(f'Invalid search mode: should be one of {self.search_modes}, but it\'s {search_mode}')
+
+        self.search_mode = search_mode
+        self.tech_classes = tuple(tech_classes) if tech_classes is not None else (
             SingleCandidate,
             HiddenSingle,
             NakedSubset,
             LockedCandidatesOnLine,
+            HiddenSubset,
             # LockedCandidatesInBox,
-            # XWing,
-            # HiddenSubset,
+            Fish,
         )
         self.hp_tech_classes = (
             SingleCandidate,
@@ -35,78 +96,295 @@ class SudokuSolver:
         )
         self.lp_tech_classes = (
             LockedCandidatesInBox,
-            XWing,
-            HiddenSubset,
+            Fish,
         )
 
         self.high_priority_tech = [tech() for tech in self.tech_classes if tech in self.hp_tech_classes]
         self.normal_priority_tech = [tech() for tech in self.tech_classes if tech not in self.hp_tech_classes
                                      and tech not in self.lp_tech_classes]
         self.low_priority_tech = [tech() for tech in self.tech_classes if tech in self.lp_tech_classes]
+        # Whether `Puzzle.propagate` can stand in for the whole high priority tier
+        self.propagates_singles = bool(self.high_priority_tech) and all(
+            tech.propagated for tech in self.high_priority_tech)
+
+        self.stats: Optional[StatsCollector] = None
+        self.set_stats(stats)
+        self.cache = cache
+
+        self.tracer = tracer
+        # Tracer currently given to the techniques
+        self.active_tracer: Optional[Tracer] = None
+
+        self.policy = policy if policy is not None else FixedOrderPolicy()
 
         self.bruteforce_counter = 0
 
-    def solve(self, original_puzzle: Puzzle) -> bool:
+    def set_stats(self, stats: Optional[StatsCollector]):
+        self.stats = stats
+        for tech in self.high_priority_tech + self.normal_priority_tech + self.low_priority_tech:
+            tech.stats = stats
+
+    def get_tracer(self) -> Optional[Tracer]:
+        if self.tracer is not None:
+            return self.tracer
+
+        return console if cfg.solve_output_enabled else None
+
+    def use_tracer(self, puzzle: Puzzle) -> Optional[Tracer]:
+        # Called once per logical pass, so the config switch can be flipped between solves
+        tracer = self.get_tracer()
+        puzzle.tracer = tracer
+        # Singles are placed by the puzzle itself unless they have to show up as technique steps
+        puzzle.auto_propagate = tracer is None and self.stats is None and self.propagates_singles
+        if tracer is not self.active_tracer:
+            self.active_tracer = tracer
+            for tech in self.high_priority_tech + self.normal_priority_tech + self.low_priority_tech:
+                tech.tracer = tracer
+
+        return tracer
+
+    def solve(self, puzzle: Puzzle) -> bool:
+        # The solver sets these on the puzzle for the duration of the solve only
+        tracer = puzzle.tracer
+        auto_propagate = puzzle.auto_propagate
+        try:
+            if self.cache is not None:
+                return self.solve_with_cache(puzzle)
+
+            return self.solve_and_measure(puzzle)
+        finally:
+            puzzle.tracer = tracer
+            puzzle.auto_propagate = auto_propagate
+
+    def solve_with_cache(self, puzzle: Puzzle) -> bool:
+        solution, form = self.cache.lookup(puzzle)
+        if solution is not None:
+            tracer = self.use_tracer(puzzle)
+            if tracer is not None:
+                tracer.emit(TraceEvent('cache_hit'))
+            puzzle.fill_grid(solution)
+            return puzzle.check_if_solved()
+
+        unsolved_puzzle = puzzle.copy()
+        is_solved = self.solve_and_measure(puzzle)
+        if is_solved:
+            self.cache.put(unsolved_puzzle, puzzle.grid, form)
+
+        return is_solved
+
+    def solve_and_measure(self, puzzle: Puzzle) -> bool:
+        stats = self.stats
+        if stats is None:
+            return self.solve_with_search_mode(puzzle)
+
+        stats.start_puzzle(puzzle.get_puzzle_string())
+        time_start = time.perf_counter()
+        is_solved = self.solve_with_search_mode(puzzle)
+        stats.end_puzzle(is_solved, time.perf_counter() - time_start)
+        return is_solved
+
+    def solve_with_search_mode(self, puzzle: Puzzle) -> bool:
+        if self.search_mode in ('trail', 'dlx'):
+            return self.solve_with_trail(puzzle)
+
+        return self.solve_with_copies(puzzle)
+
+    def solve_with_copies(self, original_puzzle: Puzzle) -> bool:
         queue: List[Puzzle] = [original_puzzle]
 
         while queue:
             puzzle = queue.pop()
-            if self.solve_logically(puzzle):
-                if cfg.solve_output_enabled:
-                    print("Puzzle solved\n")
+            is_solved = self.solve_logically(puzzle)
+            tracer = puzzle.tracer
+            if is_solved:
+                if tracer is not None:
+                    tracer.emit(TraceEvent('solved'))
+                if puzzle is not original_puzzle:
+                    original_puzzle.update_from(puzzle)
                 return True
 
             if puzzle.is_impossible():
-                if cfg.solve_output_enabled:
-                    print(f'Puzzle is impossible to solve!')
-                    # print(puzzle.fancy_display())
+                if tracer is not None:
+                    tracer.emit(TraceEvent('impossible'))
                 continue
 
             self.bruteforce_counter += 1
 
-            x, y = puzzle.find_cell_with_fewest_candidates()
-            if cfg.solve_output_enabled:
-                print(f'Going to pick cell {convert_index(x, y)} and bruteforce from there')
+            cell = puzzle.find_cell_with_fewest_candidates()
+            if tracer is not None:
+                self.trace_branch(tracer, puzzle, cell)
 
-            for cand in puzzle.candidates[y][x]:
+            for cand in iter_values(puzzle.candidates[cell]):
                 new_puzzle = puzzle.copy()
-                new_puzzle.assign_value_to_cell(cand, x, y)
+                new_puzzle.assign_value_to_cell(cand, cell)
                 queue.append(new_puzzle)
 
         return False
 
+    def solve_with_trail(self, puzzle: Puzzle) -> bool:
+        """Depth-first search on a single puzzle using its undo log.
+
+        Logical techniques run after every guess. Branches are tried in the same order as in
+        `copy` mode, or on exact cover constraints in `dlx` mode. If the puzzle turns out to be
+        unsolvable, it is rolled back to the state after the first logical pass.
+        """
+        puzzle.start_trail()
+        try:
+            for _ in self.iter_trail_solutions(puzzle):
+                if puzzle.tracer is not None:
+                    puzzle.tracer.emit(TraceEvent('solved'))
+                return True
+
+            return False
+        finally:
+            puzzle.stop_trail()
+
+    def iter_trail_solutions(self, puzzle: Puzzle) -> Iterator[Puzzle]:
+        """Walk the whole search tree of a puzzle, yielding the puzzle every time it is solved.
+
+        The puzzle must have its trail started. Every yielded state is valid until the
+        iteration resumes. Once the tree is exhausted the puzzle is rolled back to the
+        state after the first logical pass.
+        """
+        # (trail mark before the branch, (value, cell) placements not tried yet, the last one goes first)
+        stack: List[Tuple[int, List[Tuple[int, int]]]] = []
+        root_mark = None
+
+        while True:
+            if self.solve_logically(puzzle):
+                yield puzzle
+            else:
+                if root_mark is None:
+                    root_mark = puzzle.get_trail_mark()
+
+                tracer = puzzle.tracer
+                if puzzle.is_impossible():
+                    if tracer is not None:
+                        tracer.emit(TraceEvent('impossible'))
+                elif not puzzle.check_if_solved():
+                    self.bruteforce_counter += 1
+                    stack.append((puzzle.get_trail_mark(), self.get_branch_placements(puzzle)))
+
+            while stack:
+                mark, placements = stack[-1]
+                if not placements:
+                    stack.pop()
+                    continue
+
+                puzzle.undo_to(mark)
+                puzzle.assign_value_to_cell(*placements.pop())
+                break
+            else:
+                if root_mark is not None:
+                    puzzle.undo_to(root_mark)
+                return
+
+    def get_branch_placements(self, puzzle: Puzzle) -> List[Tuple[int, int]]:
+        """Placements a search branches on, as (value, cell) pairs, the last one is tried first.
+
+        The cell with the fewest candidates, highest candidate first, same as popping the copies
+        in `copy` mode. In `dlx` mode a value with fewer places in some unit than that cell has
+        candidates is branched on instead, lowest cell first, which makes it the exact cover
+        column with the fewest rows.
+        """
+        tracer = puzzle.tracer
+        cell = puzzle.find_cell_with_fewest_candidates()
+        candidates = puzzle.candidates[cell]
+        if self.search_mode == 'dlx' and candidates.bit_count() > 2:
+            value, cells = puzzle.find_value_with_fewest_places(candidates.bit_count())
+            if value:
+                if tracer is not None:
+                    tracer.emit(TraceEvent('value_branch', value=value, cells=list(iter_indices(cells)),
+                                           cell_names=[puzzle.cell_name(cell) for cell in iter_indices(cells)]))
+                return [(value, cell) for cell in reversed(list(iter_indices(cells)))]
+
+        if tracer is not None:
+            self.trace_branch(tracer, puzzle, cell)
+        return [(value, cell) for value in iter_values(candidates)]
+
+    def count_solutions(self, puzzle: Puzzle, limit: int = 2) -> int:
+        """Count solutions of a puzzle, stopping as soon as `limit` of them are found.
+
+        With the default limit the result tells apart puzzles with no solution (0),
+        a unique one (1) and several (2). Logical techniques prune every branch, none of
+        them rely on the puzzle being unique. The puzzle itself is left untouched.
+
+        :param puzzle: puzzle to check
+        :param limit: stop counting once this many solutions are found
+        :return: number of solutions, at most `limit`
+        """
+        if not puzzle.has_valid_clues():
+            return 0
+
+        work_puzzle = puzzle.copy()
+        work_puzzle.start_trail()
+        count = 0
+        for _ in self.iter_trail_solutions(work_puzzle):
+            count += 1
+            if count >= limit:
+                break
+
+        return count
+
+    def batch_count_solutions(self, source: Source, limit: int = 2,
+                              sink: Optional[TextIO] = None) -> Dict[int, int]:
+        """Count solutions of every puzzle from a source.
+
+        :param source: path to a batch file, an open text stream or `-` for stdin
+        :param limit: passed to `count_solutions`
+        :param sink: text stream for `<puzzle string> <count>` lines, optional
+        :return: how many puzzles have each solution count
+        """
+        previous_output = cfg.solve_output_enabled
+        cfg.solve_output_enabled = False
+        histogram = {count: 0 for count in range(limit + 1)}
+        try:
+            for puzzle_string in read_puzzle_strings(source):
+                count = self.count_solutions(Puzzle.from_string(puzzle_string), limit)
+                histogram[count] += 1
+                write_line(sink, f'{puzzle_string} {count}')
+        finally:
+            cfg.solve_output_enabled = previous_output
+
+        return histogram
+
     def solve_logically(self, puzzle: Puzzle) -> bool:
+        tracer = self.use_tracer(puzzle)
         is_validated = False
 
         while not puzzle.check_if_solved():
-            any_progress = False
-
-            self.apply_tech_group_repeatedly(puzzle, self.high_priority_tech)
-            if puzzle.check_if_solved():
+            if puzzle.auto_propagate:
+                puzzle.propagate()
+            else:
+                self.apply_tech_group_repeatedly(puzzle, self.high_priority_tech)
+            # Nothing can fix an empty cell, the search takes it from here
+            if puzzle.check_if_solved() or puzzle.is_impossible():
                 break
 
-            lp_progress = self.apply_tech_group_once(puzzle, self.normal_priority_tech)
-            any_progress = any_progress or lp_progress
-            if not any_progress:
-                if not self.apply_tech_group_once(puzzle, self.low_priority_tech):
-                    self.notify_no_progress()
+            if not self.apply_tech_tier(puzzle, self.normal_priority_tech):
+                if not self.apply_tech_tier(puzzle, self.low_priority_tech):
+                    if tracer is not None:
+                        tracer.emit(TraceEvent('no_progress'))
                     break
 
-        self.give_breakdown(puzzle)
-
-        if puzzle.check_if_solved():
+        is_solved = puzzle.check_if_solved()
+        if is_solved:
             is_validated = puzzle.validate_solution()
             if not is_validated:
                 self.notify_solution_invalid()
-        else:
-            self.show_puzzle_string(puzzle)
 
-        self.display_puzzle(puzzle)
+        if tracer is not None:
+            tracer.emit(TraceEvent('finished', original_clue_count=puzzle.original_clue_count,
+                                   cell_count=puzzle.count_cells(), total_cells=puzzle.geometry.cell_count,
+                                   is_solved=is_solved, puzzle_string=puzzle.get_puzzle_string(),
+                                   rows=puzzle.get_rows()))
 
         return is_validated
 
-    @staticmethod
-    def apply_tech_group_repeatedly(puzzle: Puzzle, group: List[Technique]) -> bool:
+    def apply_tech_group_repeatedly(self, puzzle: Puzzle, group: List[Technique]) -> bool:
+        # With `stop_on_progress` every progress starts the group over, so later techniques only run when earlier
+        # ones are stuck
+        stop_on_progress = self.policy.stop_on_progress
         total_progress = False
         while True:
             iteration_progress = False
@@ -114,62 +392,206 @@ class SudokuSolver:
             for tech in group:
                 tech_progress = tech.apply(puzzle)
                 iteration_progress = iteration_progress or tech_progress
+                if tech_progress and stop_on_progress:
+                    break
 
             total_progress = total_progress or iteration_progress
 
             if not iteration_progress:
                 return total_progress
 
-    @staticmethod
-    def apply_tech_group_once(puzzle: Puzzle, group: List[Technique]) -> bool:
+    def apply_tech_tier(self, puzzle: Puzzle, group: List[Technique]) -> bool:
+        # Techniques of a tier in the order the policy gives, each at most once
+        policy = self.policy
         total_progress = False
 
-        for tech in group:
-            tech_progress = tech.apply(puzzle)
+        for tech in policy.order(puzzle, group):
+            if policy.measures:
+                removed_count = puzzle.removed_count
+                time_start = time.perf_counter()
+                tech_progress = tech.apply(puzzle)
+                policy.record(tech, time.perf_counter() - time_start, puzzle.removed_count - removed_count)
+            else:
+                tech_progress = tech.apply(puzzle)
+
             total_progress = total_progress or tech_progress
+            if tech_progress and policy.stop_on_progress:
+                break
 
         return total_progress
 
+    def solve_string(self, puzzle_string: str) -> SolveResult:
+        puzzle = Puzzle.from_string(puzzle_string)
+        is_solved = self.solve(puzzle)
+        return is_solved, puzzle.get_puzzle_string()
+
+    def solve_stream(self, puzzle_strings: Iterable[str],
+                     workers: int = 1,
+                     chunk_size: int = 250,
+                     vectorized: bool = False) -> Iterator[SolveResult]:
+        """Lazily solve puzzle strings, optionally spreading them over several processes.
+
+        Results are yielded in input order as soon as they are ready. Input is consumed
+        chunk by chunk with at most `2 * workers` chunks in flight, so memory use does not
+        grow with the input size. Technique stats and bruteforce counter of the worker
+        processes are merged into this process, same as for a serial run.
+
+        :param puzzle_strings: puzzles to solve, one string each, can be any iterable
+        :param workers: number of worker processes, 1 solves everything in this process
+        :param chunk_size: how many puzzle strings a worker gets at once
+        :param vectorized: run singles and pointing candidates over whole chunks with numpy first,
+            see `models.vector_engine`. Only used in this process, `workers` is ignored. All puzzles
+            must have the size of the first one
+        :return: iterator of (is solved, final puzzle string) for every puzzle
+        """
+        if vectorized:
+            # numpy is only needed for this mode
+            from models.vector_engine import VectorEngine
+            puzzle_strings = iter(puzzle_strings)
+            first = next(puzzle_strings, None)
+            if first is None:
+                return
+
+            # The engine works on one size, taken from the first string like for packed batches.
+            # Lengths that are no size are left to the engine, it rejects them
+            size = isqrt(len(first))
+            if size not in Puzzle.supported_sizes or size * size != len(first):
+                size = 9
+            yield from VectorEngine(size, solver=self).solve_stream(chain([first], puzzle_strings))
+            return
+
+        if workers <= 1:
+            for puzzle_string in puzzle_strings:
+                yield self.solve_string(puzzle_string)
+            return
+
+        from multiprocessing import Pool
+
+        stats_mode = None if self.stats is None else self.stats.per_puzzle
+        initargs = (self.search_mode, stats_mode, self.policy, self.tech_classes)
+        with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            pending = deque()
+            for chunk in iter_chunks(puzzle_strings, chunk_size):
+                pending.append(pool.apply_async(_solve_chunk, (chunk,)))
+                if len(pending) >= 2 * workers:
+                    yield from self.merge_chunk_output(pending.popleft().get())
+
+            while pending:
+                yield from self.merge_chunk_output(pending.popleft().get())
+
+    def solve_packed(self, path: Union[str, Path],
+                     workers: int = 1,
+                     chunk_size: int = 250) -> Iterator[SolveResult]:
+        """Lazily solve every puzzle of a packed batch file, see `models.packed_batch`.
+
+        Same as `solve_stream`, except that workers only get record ranges and read
+        the puzzles from their own memory mapping of the file, nothing is copied to them.
+        """
+        from models.packed_batch import PackedBatch
+
+        with PackedBatch(path) as batch:
+            if workers <= 1:
+                yield from self.solve_stream(batch)
+                return
+
+            from multiprocessing import Pool
+
+            stats_mode = None if self.stats is None else self.stats.per_puzzle
+            initargs = (self.search_mode, stats_mode, self.policy, self.tech_classes)
+            with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                pending = deque()
+                for start, stop in batch.chunk_ranges(chunk_size):
+                    pending.append(pool.apply_async(_solve_packed_chunk, (str(path), start, stop)))
+                    if len(pending) >= 2 * workers:
+                        yield from self.merge_chunk_output(pending.popleft().get())
+
+                while pending:
+                    yield from self.merge_chunk_output(pending.popleft().get())
+
+    def merge_chunk_output(self, chunk_output: ChunkOutput) -> List[SolveResult]:
+        chunk_results, chunk_stats, bruteforce_count = chunk_output
+        if self.stats is not None and chunk_stats is not None:
+            self.stats.merge(chunk_stats)
+        self.bruteforce_counter += bruteforce_count
+        return chunk_results
+
+    def solve_many(self, puzzle_strings: Iterable[str],
+                   workers: int = 1,
+                   chunk_size: int = 250) -> List[SolveResult]:
+        return list(self.solve_stream(puzzle_strings, workers=workers, chunk_size=chunk_size))
+
+    def solve_to_sinks(self, source: Source,
+                       solved_sink: Optional[TextIO] = None,
+                       unsolved_sink: Optional[TextIO] = None,
+                       workers: int = 1,
+                       vectorized: bool = False) -> Tuple[int, int]:
+        """Solve every puzzle from a source and write results as they come.
+
+        Solved puzzles go to `solved_sink`, final states of unsolved ones go to `unsolved_sink`,
+        one puzzle string per line. Either sink can be omitted.
+
+        :param source: path to a batch file, an open text stream or `-` for stdin
+        :param solved_sink: text stream for solved puzzle strings, optional
+        :param unsolved_sink: text stream for unsolved puzzle strings, optional
+        :param workers: number of worker processes
+        :param vectorized: use the numpy batch engine first
+        :return: total and unsolved puzzle counts
+        """
+        total_count = 0
+        unsolved_count = 0
+        if is_packed_path(source) and not vectorized:
+            results = self.solve_packed(source, workers=workers)
+        else:
+            results = self.solve_stream(read_puzzle_strings(source), workers=workers, vectorized=vectorized)
+        for is_solved, puzzle_state in results:
+            total_count += 1
+            if is_solved:
+                write_line(solved_sink, puzzle_state)
+            else:
+                unsolved_count += 1
+                write_line(unsolved_sink, puzzle_state)
+
+        return total_count, unsolved_count
+
     def batch_solve(self, filename: str,
                     save_results: bool = False,
                     results_filename: str = None,
-                    save_unsolved: bool = False) -> float:
+                    save_unsolved: bool = False,
+                    workers: int = 1,
+                    vectorized: bool = False) -> float:
         if results_filename is None:
             results_filename = 'results.txt'
 
         self.bruteforce_counter = 0
 
-        with open(self.batches_path / filename) as f:
-            all_puzzles = f.read().splitlines()
-
+        # Technique lines of the report are only there if the solver has a collector. Measuring turns
+        # `Puzzle.propagate` off, so runs without one are faster and time only the solving itself.
         cfg.solve_output_enabled = False
-        unsolved = []
         time_start = time.perf_counter()
 
-        for puzzle_string in all_puzzles:
-            puzzle = Puzzle.from_string(puzzle_string)
-            if not self.solve(puzzle):
-                puzzle_state = puzzle.get_puzzle_string()
-                unsolved.append(puzzle_state)
+        with ExitStack() as stack:
+            unsolved_sink = None
+            if save_unsolved:
+                unsolved_sink = stack.enter_context(open(self.batches_path / f'unsolved_{filename}', 'w'))
 
-        time_taken = time.perf_counter() - time_start
+            total_count, unsolved_count = self.solve_to_sinks(self.batches_path / filename,
+                                                              unsolved_sink=unsolved_sink, workers=workers,
+                                                              vectorized=vectorized)
 
-        if save_unsolved:
-            with open(self.batches_path / f'unsolved_{filename}', 'w') as f:
-                f.write('\n'.join(unsolved))
+            time_taken = time.perf_counter() - time_start
+
+            output_string = self.construct_result_string(filename, total_count,
+                                                         unsolved_count, time_taken)
+            self.reset_tech_stats()
 
-        output_string = self.construct_result_string(filename, len(all_puzzles),
-                                                     len(unsolved), time_taken)
         print(output_string)
         if save_results:
             with open(self.batches_path / results_filename, 'a', encoding='utf-8') as f:
                 f.write(output_string)
 
-        self.reset_tech_stats()
-
         return time_taken
 
-    def batch_solve_everything(self, results_filename: str, save_unsolved=False):
+    def batch_solve_everything(self, results_filename: str, save_unsolved=False, workers: int = 1):
         results_file = self.batches_path / results_filename
         if results_file.is_file():
             print(f'{results_filename} already exists')
@@ -179,7 +601,7 @@ class SudokuSolver:
         total_time_taken = 0
         for file in files:
             time_taken = self.batch_solve(file, save_results=True, results_filename=results_filename,
-                                          save_unsolved=save_unsolved)
+                                          save_unsolved=save_unsolved, workers=workers)
             total_time_taken += time_taken
 
         with open(self.batches_path / results_filename, 'a', encoding='utf-8') as f:
@@ -188,19 +610,21 @@ class SudokuSolver:
             f.write(total_time_line)
 
     def solve_random_from_batch(self, batch_filename: str):
-        with open(self.batches_path / batch_filename) as f:
-            all_puzzles = f.read().splitlines()
-
-        puzzle_string = random.choice(all_puzzles)
+        path = self.batches_path / batch_filename
+        if is_packed_path(path):
+            # Records have a fixed size, so a random one is picked without reading the file
+            from models.packed_batch import PackedBatch
+            with PackedBatch(path) as batch:
+                puzzle_string = batch.random_string()
+        else:
+            puzzle_string = sample_puzzle_string(read_puzzle_strings(path))
         puzzle = Puzzle.from_string(puzzle_string)
         print(f'Solving {puzzle_string}\n')
         self.solve(puzzle)
 
     def reset_tech_stats(self):
-        for tech in self.tech_classes:
-            tech.total_uses = 0
-            tech.successful_uses = 0
-            tech.total_time = 0.0
+        if self.stats is not None:
+            self.stats.reset()
 
     def construct_result_string(self, filename: str, total_count: int,
                                 unsolved_count: int, time_taken: float) -> str:
@@ -210,56 +634,73 @@ class SudokuSolver:
         time_per_sudoku = time_taken / total_count
         output.append(f'Total: {total_count}, unsolved: {unsolved_count} ({unsolved_rate:.1%}), '
                       f'took {time_taken:.2f}s ({(time_per_sudoku * 1000):.1f}ms per)')
-        for tech in self.tech_classes:
-            if tech.total_uses > 0:
-                avg_time_per_tech_use = tech.total_time / tech.total_uses * 10 ** 6
+        if self.stats is None:
+            output.append(f'Used bruteforce {self.bruteforce_counter} times')
+            output.append('Technique stats were not collected')
+            return '\n'.join(output) + '\n\n'
+
+        all_tech_stats = [self.stats.get(tech.__name__) for tech in self.tech_classes]
+        for tech, tech_stats in zip(self.tech_classes, all_tech_stats):
+            if tech_stats.total_uses > 0:
+                avg_time_per_tech_use = tech_stats.total_time / tech_stats.total_uses * 10 ** 6
                 avg_line = f' ({round(avg_time_per_tech_use)}μs per)'
             else:
                 avg_line = ''
 
-            use_rate = tech.successful_uses / tech.total_uses
-            output.append(f'{tech.__name__}: {tech.successful_uses}/{tech.total_uses} uses ({use_rate:.0%}), '
-                          f'took {tech.total_time:.2f}s{avg_line}')
+            use_rate = tech_stats.successful_uses / tech_stats.total_uses if tech_stats.total_uses else 0
+            output.append(f'{tech.__name__}: {tech_stats.successful_uses}/{tech_stats.total_uses} uses '
+                          f'({use_rate:.0%}), took {tech_stats.total_time:.2f}s{avg_line}')
 
         output.append(f'Used bruteforce {self.bruteforce_counter} times')
 
-        total_uses = sum(tech.total_uses for tech in self.tech_classes)
-        total_time = sum(tech.total_time for tech in self.tech_classes)
-        avg_time = total_time / total_uses * 10 ** 6
+        total_uses = sum(tech_stats.total_uses for tech_stats in all_tech_stats)
+        total_time = sum(tech_stats.total_time for tech_stats in all_tech_stats)
+        avg_time = total_time / total_uses * 10 ** 6 if total_uses else 0
         output.append(f'TOTAL USES: {total_uses}, {round(avg_time)}μs per')
 
         return '\n'.join(output) + '\n\n'
 
-    @staticmethod
-    def notify_no_progress():
-        if cfg.solve_output_enabled:
-            print('No progress detected, stopping the solve')
-
     @staticmethod
     def notify_solution_invalid():
         print('Solution is invalid!\n')
 
     @staticmethod
-    def give_breakdown(puzzle: Puzzle):
-        if cfg.solve_output_enabled:
-            current_cell_count = puzzle.count_cells()
-            total_cells = puzzle.size * puzzle.size
-            print(f'\nOriginal clue count: {puzzle.original_clue_count}')
-            print(f'Cells solved: {current_cell_count - puzzle.original_clue_count}')
-            print(f'Final progress: {(current_cell_count / total_cells):.0%}\n')
+    def trace_branch(tracer: Tracer, puzzle: Puzzle, cell: int):
+        tracer.emit(TraceEvent('branch', cell=cell, cell_name=puzzle.cell_name(cell),
+                               candidates=list(iter_values(puzzle.candidates[cell]))))
 
-    @staticmethod
-    def display_puzzle(puzzle: Puzzle):
-        if cfg.solve_output_enabled:
-            for row in puzzle.grid:
-                print(row)
 
-    @staticmethod
-    def show_puzzle_string(puzzle: Puzzle):
-        if cfg.solve_output_enabled:
-            print('Final puzzle state:')
-            print(puzzle.get_puzzle_string())
-            print()
+_worker_solver: Optional[SudokuSolver] = None
+
+
+def _init_worker(search_mode: str, stats_mode: Optional[bool], policy: SchedulingPolicy,
+                 tech_classes: Sequence[Type[Technique]]):
+    # stats_mode is None when the parent solver has no collector, otherwise its `per_puzzle` flag
+    global _worker_solver
+    cfg.solve_output_enabled = False
+    stats = None if stats_mode is None else StatsCollector(per_puzzle=stats_mode)
+    _worker_solver = SudokuSolver(search_mode, stats, tech_classes=tech_classes, policy=policy)
+
+
+def _solve_chunk(puzzle_strings: Sequence[str]) -> ChunkOutput:
+    # Runs in a worker process, stats are reset per chunk so that each chunk reports only its own share
+    solver = _worker_solver
+    solver.reset_tech_stats()
+    solver.bruteforce_counter = 0
+    results = [solver.solve_string(puzzle_string) for puzzle_string in puzzle_strings]
+    return results, solver.stats, solver.bruteforce_counter
+
+
+_worker_batches: Dict[str, 'PackedBatch'] = {}
+
+
+def _solve_packed_chunk(path: str, start: int, stop: int) -> ChunkOutput:
+    # Every worker maps a packed file once and keeps it open for the following chunks
+    from models.packed_batch import PackedBatch
+
+    if path not in _worker_batches:
+        _worker_batches[path] = PackedBatch(path)
+    return _solve_chunk(_worker_batches[path].get_strings(start, stop))
 
 
 if __name__ == '__main__':
@@ -1,27 +1,34 @@
 import time
+from typing import Optional
 
-import config as cfg
 from models.puzzle import Puzzle
+from models.stats import StatsCollector
+from models.trace import TraceEvent, Tracer
 
 
 def check_if_solved_and_update_stats(func):
     def wrapper(self: BaseTechnique, puzzle: Puzzle):
         if puzzle.check_if_solved():
-            if cfg.solve_output_enabled:
-                print('Puzzle is solved already')
+            if self.tracer is not None:
+                self.tracer.emit(TraceEvent('already_solved'))
 
             return False
 
-        if cfg.solve_output_enabled:
-            print(f'Applying {self.__class__.__name__} technique')
+        if self.tracer is not None:
+            self.tracer.emit(TraceEvent('technique', name=self.__class__.__name__))
 
+        stats = self.stats
+        if stats is None:
+            return func(self, puzzle)
+
+        filled_cells = puzzle.count_cells()
+        removed_count = puzzle.removed_count
         time_start = time.perf_counter()
         is_used = func(self, puzzle)
+        elapsed = time.perf_counter() - time_start
 
-        self.__class__.total_time += time.perf_counter() - time_start
-        self.__class__.total_uses += 1
-        if is_used:
-            self.__class__.successful_uses += 1
+        stats.record(self.__class__.__name__, elapsed, is_used,
+                     puzzle.removed_count - removed_count, puzzle.count_cells() - filled_cells)
 
         return is_used
 
@@ -29,9 +36,17 @@ def check_if_solved_and_update_stats(func):
 
 
 class BaseTechnique:
-    total_uses = 0
-    successful_uses = 0
-    total_time = 0.0
+    # Set by the solver, techniques don't measure anything while it's None
+    stats: Optional[StatsCollector] = None
+    # Set by the solver while tracing
+    tracer: Optional[Tracer] = None
+    # Whether `Puzzle.propagate` finds everything this technique does
+    propagated = False
 
     def apply(self, puzzle: Puzzle):
         pass
+
+    def pop_dirty_units(self, puzzle: Puzzle) -> int:
+        # Units changed since this technique last ran on the puzzle, as a bitmask of unit ids.
+        # Techniques whose findings only depend on one unit can skip the rest.
+        return puzzle.pop_dirty_units(self.__class__.__name__)
@@ -0,0 +1,72 @@
+from typing import List, Tuple
+
+from models.bitmask import Mask, full_mask, iter_indices
+from models.geometry import Cells
+from models.puzzle import Puzzle
+from models.tech.base_tech import BaseTechnique, check_if_solved_and_update_stats
+from models.tech.subsets import find_subsets
+
+
+class Fish(BaseTechnique):
+    # X-Wing, Swordfish and Jellyfish. A fish on k rows is also one on the remaining
+    # unsolved columns, so both orientations together cover any fish on a 9x9 grid.
+    max_size = 4
+
+    @check_if_solved_and_update_stats
+    def apply(self, puzzle: Puzzle) -> bool:
+        geometry = puzzle.geometry
+        size = puzzle.size
+        dirty_units = self.pop_dirty_units(puzzle)
+        dirty_rows = dirty_units & full_mask(size)
+        dirty_columns = dirty_units >> size & full_mask(size)
+        if not dirty_rows | dirty_columns:
+            return False
+
+        progress = False
+        row_mask = full_mask(size)
+        for digit in range(size):
+            # Positions of the digit in every row as a mask of columns, and the other way around.
+            # A row of the grid is a run of `size` bits in the digit's cells.
+            row_positions = []
+            column_positions = [0] * size
+            cells = puzzle.digit_cells[digit]
+            for row in range(size):
+                columns = cells >> (row * size) & row_mask
+                row_positions.append(columns)
+                for column in iter_indices(columns):
+                    column_positions[column] |= 1 << row
+
+            if self.find_fish(puzzle, digit + 1, row_positions, dirty_rows, geometry.columns, geometry.cell_row):
+                progress = True
+            if self.find_fish(puzzle, digit + 1, column_positions, dirty_columns, geometry.rows, geometry.cell_column):
+                progress = True
+
+        return progress
+
+    def find_fish(self, puzzle: Puzzle, value: int,
+                  positions: List[Mask],
+                  dirty_lines: Mask,
+                  cover_lines: Tuple[Cells, ...],
+                  cell_base_line: Cells) -> bool:
+        """Find fish of one digit with base lines in one direction and cover lines across them.
+
+        k base lines whose positions for the digit all fall into the same k cover lines
+        take the digit in those cover lines, it can be removed from the rest of them.
+
+        :param positions: positions of the digit in every base line, as masks of cover line indices
+        :param dirty_lines: base lines changed since the last run, as a mask of line indices
+        :param cover_lines: cells of every cover line
+        :param cell_base_line: base line index of every cell
+        """
+        progress = False
+        for base, cover in find_subsets(positions, self.max_size):
+            # A fish on lines that haven't changed was already found in the last run
+            if not base & dirty_lines:
+                continue
+
+            target_cells = [cell for line in iter_indices(cover) for cell in cover_lines[line]
+                            if not base >> cell_base_line[cell] & 1]
+            if puzzle.remove_candidate_from_group(value, target_cells):
+                progress = True
+
+        return progress
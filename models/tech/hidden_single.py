@@ -1,17 +1,24 @@
+from models.bitmask import iter_indices
 from models.puzzle import Puzzle
 from models.tech.base_tech import BaseTechnique, check_if_solved_and_update_stats
 
 
 class HiddenSingle(BaseTechnique):
+    propagated = True
+
     @check_if_solved_and_update_stats
     def apply(self, puzzle: Puzzle):
         is_progress = False
-        for group in puzzle.get_all_group_indices():
-            counter = puzzle.get_candidates_counter(group)
-            for value, count in counter.items():
-                if count == 1:
-                    for x, y in puzzle.get_candidates_indices_by_value(value, group):
-                        puzzle.assign_value_to_cell(value, x, y)
-                        is_progress = True
+        digit_cells = puzzle.digit_cells
+        unit_masks = puzzle.geometry.unit_masks
+        for unit_id in iter_indices(self.pop_dirty_units(puzzle)):
+            unit_mask = unit_masks[unit_id]
+            # Digits with a single place left in the unit, all found before any of them is placed
+            single_digits = [digit for digit, cells in enumerate(digit_cells) if (cells & unit_mask).bit_count() == 1]
+            for digit in single_digits:
+                # Gone if an earlier placement in the unit took the place
+                if places := digit_cells[digit] & unit_mask:
+                    puzzle.assign_value_to_cell(digit + 1, places.bit_length() - 1)
+                    is_progress = True
 
         return is_progress
@@ -1,40 +1,32 @@
-from itertools import combinations
-
+from models.bitmask import iter_indices, iter_values, mask_union
 from models.puzzle import Puzzle
 from models.tech.base_tech import BaseTechnique, check_if_solved_and_update_stats
+from models.tech.subsets import find_subsets
 
 
 class HiddenSubset(BaseTechnique):
+    # Pairs, triples and quads, see `NakedSubset` for bigger ones
+    max_size = 4
+
     @check_if_solved_and_update_stats
     def apply(self, puzzle: Puzzle) -> bool:
         is_progress = False
-        for group in puzzle.get_all_group_indices():
-            cands_list = [cands for x, y in group if (cands := puzzle.candidates[y][x])]
-            if len(cands_list) <= 2:
+        candidates = puzzle.candidates
+        unit_masks = puzzle.geometry.unit_masks
+        for unit_id in iter_indices(self.pop_dirty_units(puzzle)):
+            # Places of every digit in the unit, as masks of cells
+            unit_mask = unit_masks[unit_id]
+            positions = [cells & unit_mask for cells in puzzle.digit_cells]
+            if mask_union(positions).bit_count() <= 2:
                 continue
 
-            all_cand_values = {cand_value for cands in cands_list for cand_value in cands}
-            for cand_count in range(2, 5):  # should not be 5 here but atm dunno how else.
-                if len(cands_list) <= cand_count:
-                    continue
-
-                for combo in combinations(cands_list, cand_count):
-                    combo_values = {n for s in combo for n in s}
-                    the_rest = [x for x in cands_list]
-                    for one in combo:
-                        the_rest.remove(one)
-                    the_rest_values = {n for s in the_rest for n in s}
-                    target_values = all_cand_values - the_rest_values
-                    if len(target_values) == cand_count:
-                        values_to_remove = combo_values - target_values
-                        if not values_to_remove:
-                            continue
-
-                        # print(f"  Hidden {('Pair', 'Triple', 'Quad')[cand_count - 2]} spotted!")
-                        target_cells = {cells for x in target_values
-                                        for cells in puzzle.get_candidates_indices_by_value(x, group)}
-                        for value in values_to_remove:
-                            if puzzle.remove_candidate_from_group(value, target_cells):
-                                is_progress = True
+            # Digit indices match candidate bits, so the members mask is the subset's values
+            for values, places in find_subsets(positions, self.max_size):
+                target_cells = list(iter_indices(places))
+                # k digits that only fit into k cells, those cells can't hold anything else
+                values_to_remove = mask_union(candidates[cell] for cell in target_cells) & ~values
+                for value in iter_values(values_to_remove):
+                    if puzzle.remove_candidate_from_group(value, target_cells):
+                        is_progress = True
 
         return is_progress
@@ -1,3 +1,4 @@
+from models.bitmask import iter_indices
 from models.puzzle import Puzzle
 from models.tech.base_tech import BaseTechnique, check_if_solved_and_update_stats
 
@@ -6,31 +7,38 @@ class LockedCandidatesOnLine(BaseTechnique):
     @check_if_solved_and_update_stats
     def apply(self, puzzle: Puzzle) -> bool:
         is_progress = False
-        for box in puzzle.get_all_box_indices():
-            counter = puzzle.get_candidates_counter(box)
-            for value, count in counter.items():
+        geometry = puzzle.geometry
+        unit_masks = geometry.unit_masks
+        size = puzzle.size
+        # Whether a digit is locked only depends on its box, changes elsewhere can't create new findings
+        dirty_boxes = self.pop_dirty_units(puzzle) & geometry.box_units_mask
+        for unit_id in iter_indices(dirty_boxes):
+            box_mask = unit_masks[unit_id]
+            for digit, cells in enumerate(puzzle.digit_cells):
+                places = cells & box_mask
+
                 # Check if they can form a line
-                if not 2 <= count <= puzzle.box_size:
+                if not 2 <= places.bit_count() <= puzzle.box_size:
                     continue
 
-                cands = puzzle.get_candidates_indices_by_value(value, box)
-                line_is_formed = False
+                # Row and column of any of the places
+                cell = places.bit_length() - 1
+                row_mask = unit_masks[geometry.cell_row[cell]]
+                column_mask = unit_masks[size + geometry.cell_column[cell]]
 
                 # Horizontal alignment / row
-                if len(set(x[1] for x in cands)) == 1:
-                    line_is_formed = True
-                    x, y = cands.pop()
-                    target_cells = puzzle.get_row_indices(x, y) - puzzle.get_box_indices(x, y)
+                if not places & ~row_mask:
+                    line_mask = row_mask
 
                 # Vertical alignment / column
-                elif len(set(x[0] for x in cands)) == 1:
-                    line_is_formed = True
-                    x, y = cands.pop()
-                    target_cells = puzzle.get_column_indices(x, y) - puzzle.get_box_indices(x, y)
-
-                if line_is_formed:
-                    # noinspection PyUnboundLocalVariable
-                    if puzzle.remove_candidate_from_group(value, target_cells):
-                        is_progress = True
+                elif not places & ~column_mask:
+                    line_mask = column_mask
+
+                else:
+                    continue
+
+                target_cells = iter_indices(cells & line_mask & ~box_mask)
+                if puzzle.remove_candidate_from_group(digit + 1, target_cells):
+                    is_progress = True
 
         return is_progress
@@ -1,3 +1,4 @@
+from models.bitmask import iter_indices
 from models.puzzle import Puzzle
 from models.tech.base_tech import BaseTechnique, check_if_solved_and_update_stats
 
@@ -6,23 +7,27 @@ class LockedCandidatesInBox(BaseTechnique):
     @check_if_solved_and_update_stats
     def apply(self, puzzle: Puzzle) -> bool:
         is_progress = False
+        geometry = puzzle.geometry
+        unit_masks = geometry.unit_masks
+        box_units = 2 * puzzle.size
+
+        dirty_lines = self.pop_dirty_units(puzzle) & geometry.line_units_mask
+        for unit_id in iter_indices(dirty_lines):
+            line_mask = unit_masks[unit_id]
+            for digit, cells in enumerate(puzzle.digit_cells):
+                places = cells & line_mask
 
-        line_groups = puzzle.get_all_row_indices() + puzzle.get_all_column_indices()
-        for group in line_groups:
-            counter = puzzle.get_candidates_counter(group)
-            for value, count in counter.items():
                 # Check if there is enough of them and also not too many (2 or 3 for 9x9 grid)
-                if not 2 <= count <= puzzle.box_size:
+                if not 2 <= places.bit_count() <= puzzle.box_size:
                     continue
 
                 # Now check if they belong to the same box
-                indices = puzzle.get_candidates_indices_by_value(value, group)
-                if not len(set(puzzle.get_box_base_index(x, y) for x, y in indices)) == 1:
+                box_mask = unit_masks[box_units + geometry.cell_box[places.bit_length() - 1]]
+                if places & ~box_mask:
                     continue
 
-                x, y = indices.pop()
-                target_cells = puzzle.get_box_indices(x, y) - group
-                if puzzle.remove_candidate_from_group(value, target_cells):
+                target_cells = iter_indices(cells & box_mask & ~line_mask)
+                if puzzle.remove_candidate_from_group(digit + 1, target_cells):
                     is_progress = True
 
         return is_progress
@@ -1,27 +1,29 @@
-from collections import Counter
-
+from models.bitmask import iter_indices, iter_values
 from models.puzzle import Puzzle
 from models.tech.base_tech import BaseTechnique, check_if_solved_and_update_stats
+from models.tech.subsets import find_subsets
 
 
 class NakedSubset(BaseTechnique):
-    # todo this only works properly for subset of length 2
-    # https://www.learn-sudoku.com/naked-triplets.html
+    # Pairs, triples and quads. Bigger naked subsets are found as smaller hidden ones
+    # in the rest of the unit, as long as `HiddenSubset` is on too.
+    max_size = 4
+
     @check_if_solved_and_update_stats
     def apply(self, puzzle: Puzzle) -> bool:
         is_progress = False
-        for group in puzzle.get_all_group_indices():
-            cands_list = [cands for x, y in group if (cands := puzzle.candidates[y][x])]
-            if len(cands_list) <= 2:
+        candidates = puzzle.candidates
+        for unit_id in iter_indices(self.pop_dirty_units(puzzle)):
+            cells = [cell for cell in puzzle.units[unit_id] if candidates[cell]]
+            if len(cells) <= 2:
                 continue
 
-            counter = Counter([frozenset(cands) for cands in cands_list])
-            for cands, count in counter.items():
-                if count > 1 and count == len(cands) and count != len(cands_list):
-                    cands_cells = puzzle.get_candidates_indices_by_exact_candidates(cands, group)
-                    target_cells = group - cands_cells
-                    for value in cands:
-                        if puzzle.remove_candidate_from_group(value, target_cells):
-                            is_progress = True
+            masks = [candidates[cell] for cell in cells]
+            for members, values in find_subsets(masks, self.max_size):
+                # k cells with k candidates between them, nothing else in the unit can have those
+                target_cells = [cell for i, cell in enumerate(cells) if not members >> i & 1]
+                for value in iter_values(values):
+                    if puzzle.remove_candidate_from_group(value, target_cells):
+                        is_progress = True
 
         return is_progress
@@ -1,16 +1,23 @@
+from models.bitmask import bit_to_value
 from models.puzzle import Puzzle
 from models.tech.base_tech import BaseTechnique, check_if_solved_and_update_stats
 
 
 class SingleCandidate(BaseTechnique):
+    propagated = True
+
     @check_if_solved_and_update_stats
     def apply(self, puzzle: Puzzle) -> bool:
         is_progress = False
-        for y in range(puzzle.size):
-            for x in range(puzzle.size):
-                if len(cands := puzzle.candidates[y][x]) == 1:
-                    found_value = cands.pop()
-                    puzzle.assign_value_to_cell(found_value, x, y)
-                    is_progress = True
+        candidates = puzzle.candidates
+        count_buckets = puzzle.count_buckets
+        # Cells with a single candidate left, in cell order. Placements can create new ones,
+        # those after the current cell are taken in the same pass, same as a scan of the grid.
+        next_cell = 0
+        while singles := count_buckets[1] >> next_cell << next_cell:
+            cell = (singles & -singles).bit_length() - 1
+            puzzle.assign_value_to_cell(bit_to_value(candidates[cell]), cell)
+            is_progress = True
+            next_cell = cell + 1
 
         return is_progress
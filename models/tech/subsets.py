@@ -0,0 +1,46 @@
+from typing import Iterator, List, Sequence, Tuple
+
+from models.bitmask import Mask, popcount
+
+# Members of a subset as a bitmask of indices into the searched masks, and the union of their masks
+Subset = Tuple[Mask, Mask]
+
+
+def find_subsets(masks: Sequence[Mask], max_size: int) -> Iterator[Subset]:
+    """Find groups of k masks whose union has exactly k bits, for k from 2 to `max_size`.
+
+    This is the search behind both naked and hidden subsets. For naked subsets the masks are
+    candidates of the unsolved cells of a unit: k cells sharing k candidates. For hidden ones
+    they are positions of the missing digits within a unit: k digits confined to k cells.
+
+    Masks with fewer than 2 bits are singles and are skipped, and so is a group of every
+    non-empty mask, since it can't eliminate anything. Combinations are built up one mask at
+    a time and a branch is dropped as soon as its union has more bits than the size limit.
+    Once a group is found no superset of it is reported.
+
+    :param masks: bitmasks to combine, empty ones are ignored
+    :param max_size: largest subset to look for
+    :return: iterator of (member indices mask, union) for every subset found
+    """
+    item_count = sum(1 for mask in masks if mask)
+    max_size = min(max_size, item_count - 1)
+    items: List[Tuple[Mask, Mask]] = [(1 << i, mask) for i, mask in enumerate(masks)
+                                      if 2 <= popcount(mask) <= max_size]
+    if len(items) < 2:
+        return
+
+    # (next item to try, size the subset has with it, members so far, their union)
+    stack: List[Tuple[int, int, Mask, Mask]] = [(0, 1, 0, 0)]
+    while stack:
+        start, size, members, union = stack.pop()
+        for member, mask in items[start:]:
+            start += 1
+            new_union = union | mask
+            union_size = popcount(new_union)
+            if union_size > max_size:
+                continue
+
+            if union_size == size:
+                yield members | member, new_union
+            elif size < max_size:
+                stack.append((start, size + 1, members | member, new_union))
@@ -0,0 +1,122 @@
+import json
+import sys
+from typing import Dict, List, Optional, TextIO
+
+
+class TraceEvent:
+    def __init__(self, kind: str, **fields):
+        """One step of a solve.
+
+        Kinds and their fields:
+
+        - `technique`: a technique is applied, `name`
+        - `already_solved`: a technique was skipped because the puzzle is solved
+        - `placement`: a value is put into a cell, `value`, `cell`, `cell_name`
+        - `elimination`: a candidate is removed from cells, `value`, `cells`, `cell_names`
+        - `branch`: brute force guesses on a cell, `cell`, `cell_name`, `candidates`
+        - `value_branch`: brute force guesses on the places of a value in a unit, `value`, `cells`, `cell_names`
+        - `no_progress`: logical techniques got stuck
+        - `finished`: a logical pass ended, `original_clue_count`, `cell_count`, `total_cells`,
+          `is_solved`, `puzzle_string`, `rows`
+        - `solved`, `impossible`, `cache_hit`: outcome of a solve or a branch
+
+        Cells are flat indices, see `models.geometry`, cell names are the ones in `Puzzle.cell_name`.
+        """
+        self.kind = kind
+        self.fields = fields
+
+    def __repr__(self) -> str:
+        return f'TraceEvent({self.kind!r}, {self.fields!r})'
+
+    def to_dict(self) -> Dict[str, object]:
+        return {'event': self.kind, **self.fields}
+
+
+class Tracer:
+    """Receives trace events of a solve.
+
+    Give one to `SudokuSolver` to trace its solves. Events are only created when there
+    is a tracer, solves without one skip them entirely.
+    """
+
+    def emit(self, event: TraceEvent):
+        pass
+
+
+class TextTracer(Tracer):
+    def __init__(self, stream: Optional[TextIO] = None):
+        """Human-readable step-by-step output.
+
+        :param stream: text stream to write to, stdout at the time of writing if omitted
+        """
+        self.stream = stream
+
+    def emit(self, event: TraceEvent):
+        stream = self.stream or sys.stdout
+        fields = event.fields
+        kind = event.kind
+        if kind == 'technique':
+            lines = [f"Applying {fields['name']} technique"]
+        elif kind == 'placement':
+            lines = [f"  found {fields['value']} at position {fields['cell_name']}"]
+        elif kind == 'elimination':
+            lines = [f"  removed candidate {fields['value']} from {', '.join(fields['cell_names'])}"]
+        elif kind == 'branch':
+            lines = [f"Going to pick cell {fields['cell_name']} and bruteforce from there"]
+        elif kind == 'value_branch':
+            lines = [f"Going to place {fields['value']} in one of {', '.join(fields['cell_names'])} "
+                     f"and bruteforce from there"]
+        elif kind == 'finished':
+            lines = self.format_finished(fields)
+        else:
+            lines = [text_messages.get(kind, kind)]
+
+        stream.write('\n'.join(lines) + '\n')
+
+    @staticmethod
+    def format_finished(fields: Dict) -> List[str]:
+        cell_count = fields['cell_count']
+        lines = [
+            f"\nOriginal clue count: {fields['original_clue_count']}",
+            f"Cells solved: {cell_count - fields['original_clue_count']}",
+            f"Final progress: {(cell_count / fields['total_cells']):.0%}\n",
+        ]
+        if not fields['is_solved']:
+            lines += ['Final puzzle state:', fields['puzzle_string'], '']
+        lines += [str(row) for row in fields['rows']]
+        return lines
+
+
+# Lines for events that have no fields
+text_messages = {
+    'already_solved': 'Puzzle is solved already',
+    'no_progress': 'No progress detected, stopping the solve',
+    'solved': 'Puzzle solved\n',
+    'impossible': 'Puzzle is impossible to solve!',
+    'cache_hit': 'Solution taken from cache\n',
+}
+
+
+class JsonlTracer(Tracer):
+    def __init__(self, stream: TextIO):
+        """Every event as a JSON object on its own line, with the kind under `event`."""
+        self.stream = stream
+
+    def emit(self, event: TraceEvent):
+        self.stream.write(json.dumps(event.to_dict()) + '\n')
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        """Keeps events in memory, e.g. to build explanations or to inspect a solve."""
+        self.events: List[TraceEvent] = []
+
+    def emit(self, event: TraceEvent):
+        self.events.append(event)
+
+    def clear(self):
+        self.events = []
+
+
+# Used when the solver has no tracer of its own and `solve_output_enabled` is on
+console = TextTracer()
@@ -0,0 +1,205 @@
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from models.batch_io import iter_chunks
+from models.encoding import symbol_values, symbols
+from models.geometry import get_geometry
+from models.puzzle import Puzzle
+
+# Whether the puzzle got solved and its final puzzle string, same as `models.sudoku_solver.SolveResult`
+SolveResult = Tuple[bool, str]
+
+# Propagation status of every puzzle in a batch
+UNRESOLVED = 0
+SOLVED = 1
+CONTRADICTION = 2
+
+
+class VectorEngine:
+    def __init__(self, size: int = 9, solver=None):
+        """Batch propagation of simple techniques over many puzzles at once.
+
+        Puzzles are held as an `(N, cells)` uint8 grid array and an `(N, cells, size)` boolean
+        candidate tensor. Naked singles (`SingleCandidate`), hidden singles (`HiddenSingle`)
+        and pointing pairs/triples (`LockedCandidatesOnLine`) are applied as whole-array
+        operations until nothing changes. Only puzzles left unresolved go through
+        `SudokuSolver.solve` one by one.
+
+        :param size: width and height of the puzzles in a batch
+        :param solver: `SudokuSolver` used for unresolved puzzles, a new one is created if omitted
+        """
+        if solver is None:
+            # Imported here, sudoku_solver loads this module lazily
+            from models.sudoku_solver import SudokuSolver
+            solver = SudokuSolver()
+
+        self.solver = solver
+        self.size = size
+        self.geometry = geometry = get_geometry(size)
+        self.vector_solved_count = 0
+
+        self.units = np.array(geometry.units, dtype=np.intp)
+        self.cell_units = np.array(geometry.cell_units, dtype=np.intp)
+        self.digits = np.arange(1, size + 1, dtype=np.uint8)
+        self.bits = 1 << np.arange(size, dtype=np.int64)
+
+        box_size = geometry.box_size
+        self.row_segments, self.row_segment_sources = self._build_segments(geometry.cell_row, box_size)
+        self.column_segments, self.column_segment_sources = self._build_segments(geometry.cell_column, box_size)
+
+    def _build_segments(self, cell_line: Tuple[int, ...], box_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Intersections of boxes with rows (or columns) and the segments that point at each cell.
+
+        A segment is `box_size` cells shared by a box and a line. Segments are numbered box by box,
+        `box_size` per box. For every cell the sources are the other segments of the same line:
+        if a digit of some box is confined to such a segment, it can be removed from the cell.
+        """
+        geometry = self.geometry
+        segments = []
+        segment_ids = {}
+        for box_id, box in enumerate(geometry.boxes):
+            lines = sorted({cell_line[cell] for cell in box})
+            for line in lines:
+                segment_ids[box_id, line] = len(segments)
+                segments.append([cell for cell in box if cell_line[cell] == line])
+
+        sources = []
+        for cell in range(geometry.cell_count):
+            line = cell_line[cell]
+            sources.append([segment_id for (box_id, segment_line), segment_id in segment_ids.items()
+                            if segment_line == line and box_id != geometry.cell_box[cell]])
+
+        return np.array(segments, dtype=np.intp), np.array(sources, dtype=np.intp)
+
+    def load(self, puzzle_strings: List[str]) -> np.ndarray:
+        cell_count = self.geometry.cell_count
+        if any(len(puzzle_string) != cell_count for puzzle_string in puzzle_strings):
+            raise ValueError(f'Invalid puzzle string: length should be {cell_count}')
+
+        data = ''.join(puzzle_strings).encode('ascii', errors='replace').translate(_VALUE_TABLE)
+        grids = np.frombuffer(data, dtype=np.uint8).reshape(len(puzzle_strings), cell_count)
+        if (grids > self.size).any():
+            raise ValueError(f'Invalid puzzle string: all characters should be cell values of {self.size}x{self.size}')
+
+        return grids
+
+    def unit_presence(self, grids: np.ndarray) -> np.ndarray:
+        # (N, units, size): whether a digit is already placed in a unit
+        one_hot = grids[:, :, None] == self.digits
+        return one_hot[:, self.units, :].any(axis=2)
+
+    def initial_candidates(self, grids: np.ndarray) -> np.ndarray:
+        presence = self.unit_presence(grids)
+        blocked = presence[:, self.cell_units, :].any(axis=2)
+        return ~blocked & (grids == 0)[:, :, None]
+
+    def propagate(self, grids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Apply singles and pointing candidates to every puzzle until a fixpoint.
+
+        Puzzles that stop changing drop out of the working set, so later rounds only touch
+        the ones still making progress.
+
+        :param grids: `(N, cells)` uint8 array, 0 for unknown cells
+        :return: final grids, final candidate tensor and per-puzzle status
+        """
+        grids = grids.copy()
+        candidates = self.initial_candidates(grids)
+        status = np.full(len(grids), UNRESOLVED, dtype=np.uint8)
+        active = np.arange(len(grids))
+
+        while len(active):
+            grid, cands = grids[active], candidates[active]
+            changed = np.zeros(len(active), dtype=bool)
+
+            # Naked singles
+            counts = cands.sum(axis=2)
+            naked = (counts == 1) & (grid == 0)
+            puzzle_ids, cells = np.nonzero(naked)
+            grid[puzzle_ids, cells] = self.digits[cands[puzzle_ids, cells].argmax(axis=1)]
+            changed[puzzle_ids] = True
+
+            # Hidden singles, cells of a unit are found by the position of the only candidate
+            unit_cands = cands[:, self.units, :]
+            hidden = unit_cands.sum(axis=2) == 1
+            puzzle_ids, unit_ids, digit_ids = np.nonzero(hidden)
+            positions = unit_cands[puzzle_ids, unit_ids, :, digit_ids].argmax(axis=1)
+            cells = self.units[unit_ids, positions]
+            grid[puzzle_ids, cells] = self.digits[digit_ids]
+            changed[puzzle_ids] = True
+
+            # Drop candidates that clash with the new placements
+            blocked = self.unit_presence(grid)[:, self.cell_units, :].any(axis=2)
+            new_cands = cands & ~blocked & (grid == 0)[:, :, None]
+
+            # Pointing pairs/triples along rows and columns
+            for segments, sources in ((self.row_segments, self.row_segment_sources),
+                                      (self.column_segments, self.column_segment_sources)):
+                new_cands &= ~self.pointing_eliminations(new_cands, segments, sources)
+
+            changed |= (new_cands != cands).any(axis=(1, 2))
+
+            # Contradictions: an empty cell without candidates or a digit placed twice in a unit
+            one_hot = grid[:, :, None] == self.digits
+            duplicates = (one_hot[:, self.units, :].sum(axis=2) > 1).any(axis=(1, 2))
+            dead_cells = ((grid == 0) & ~new_cands.any(axis=2)).any(axis=1)
+            broken = duplicates | dead_cells
+            finished = (grid != 0).all(axis=1) & ~broken
+
+            grids[active] = grid
+            candidates[active] = new_cands
+            status[active[broken]] = CONTRADICTION
+            status[active[finished]] = SOLVED
+            active = active[changed & ~broken & ~finished]
+
+        return grids, candidates, status
+
+    def pointing_eliminations(self, cands: np.ndarray, segments: np.ndarray, sources: np.ndarray) -> np.ndarray:
+        box_size = self.geometry.box_size
+        # (N, segments, size): digit has a candidate inside a segment
+        segment_has = cands[:, segments, :].any(axis=2)
+        # Segments are numbered box by box, so the count of segments per box is a reshape away
+        per_box = segment_has.reshape(len(cands), -1, box_size, self.size)
+        confined = per_box & (per_box.sum(axis=2, keepdims=True) == 1)
+        pointing = confined.reshape(segment_has.shape)
+        return pointing[:, sources, :].any(axis=2)
+
+    def to_puzzle(self, grid: np.ndarray, cands: np.ndarray) -> Puzzle:
+        candidates = (cands * self.bits).sum(axis=1)
+        return Puzzle(self.size, grid.tolist(), candidates.tolist())
+
+    def solve_strings(self, puzzle_strings: List[str]) -> List[SolveResult]:
+        """Solve a list of puzzle strings, using `SudokuSolver.solve` only for the ones propagation didn't finish.
+
+        :param puzzle_strings: puzzles to solve, one string each
+        :return: list of (is solved, final puzzle string) for every puzzle, in input order
+        """
+        if not puzzle_strings:
+            return []
+
+        grids, candidates, status = self.propagate(self.load(puzzle_strings))
+        self.vector_solved_count += int((status == SOLVED).sum())
+
+        results = []
+        for i, puzzle_string in enumerate(puzzle_strings):
+            if status[i] == SOLVED:
+                results.append((True, grids[i].tobytes().translate(_SYMBOL_TABLE).decode('ascii')))
+            elif status[i] == CONTRADICTION:
+                # Let the regular solver find out on its own, so the reported state matches a serial run
+                results.append(self.solver.solve_string(puzzle_string))
+            else:
+                puzzle = self.to_puzzle(grids[i], candidates[i])
+                is_solved = self.solver.solve(puzzle)
+                results.append((is_solved, puzzle.get_puzzle_string()))
+
+        return results
+
+    def solve_stream(self, puzzle_strings: Iterable[str], chunk_size: int = 4096) -> Iterator[SolveResult]:
+        for chunk in iter_chunks(puzzle_strings, chunk_size):
+            yield from self.solve_strings(chunk)
+
+
+# Puzzle string characters to cell values, anything else is mapped out of range
+_VALUE_TABLE = bytes(symbol_values.get(chr(x), 255) for x in range(256))
+# Cell values to puzzle string characters
+_SYMBOL_TABLE = bytes(ord(symbols[x]) if x < len(symbols) else x for x in range(256))
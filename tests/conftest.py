@@ -0,0 +1,8 @@
+import pytest
+
+import config as cfg
+
+
+@pytest.fixture(autouse=True)
+def quiet_solver(monkeypatch):
+    monkeypatch.setattr(cfg, 'solve_output_enabled', False)
@@ -0,0 +1,17 @@
+from models.puzzle import Puzzle
+
+# First puzzles of puzzles/batches/5.txt
+hard_puzzle_strings = [
+    '000075400000000008080190000300001060000000034000068170204000603900000020530200000',
+    '300000000050703008000028070700000043000000000003904105400300800100040000968000200',
+    '302609005500730000000000900000940000000000109000057060008500006000000003019082040',
+]
+
+
+def get_indexes(puzzle: Puzzle):
+    return puzzle.count_buckets[:], puzzle.filled_count, puzzle.digit_cells[:]
+
+
+def recount_indexes(puzzle: Puzzle):
+    recounted = Puzzle(puzzle.size, puzzle.grid[:], puzzle.candidates[:])
+    return get_indexes(recounted)
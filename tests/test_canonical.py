@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from models.canonical import canonicalize, get_transforms, identity_form
+from models.encoding import symbols_to_grid
+from tests.helpers import hard_puzzle_strings
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_transform_round_trip(puzzle_string):
+    grid = symbols_to_grid(puzzle_string)
+    form = canonicalize(grid, 9)
+    assert form.from_canonical(form.to_canonical(grid)) == grid
+
+
+def test_identity_form_round_trip():
+    grid = symbols_to_grid(hard_puzzle_strings[0])
+    form = identity_form(grid, 9)
+    assert form.to_canonical(grid) == grid
+    assert form.from_canonical(grid) == grid
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_equivalent_puzzles_share_key(puzzle_string):
+    rng = random.Random(puzzle_string)
+    grid = symbols_to_grid(puzzle_string)
+    permutation = rng.choice(get_transforms(9))
+    relabeling = [0] + rng.sample(range(1, 10), 9)
+    equivalent = [relabeling[grid[source]] for source in permutation]
+    assert canonicalize(equivalent, 9).key == canonicalize(grid, 9).key
+
+
+def test_canonical_grid_matches_key():
+    grid = symbols_to_grid(hard_puzzle_strings[1])
+    form = canonicalize(grid, 9)
+    assert ''.join(map(str, form.to_canonical(grid))) == form.key
+
+
+def get_reference_key(grid, size):
+    # Every transform relabeled in full, the smallest result wins
+    keys = []
+    for permutation in get_transforms(size):
+        labels = {}
+        keys.append([labels.setdefault(grid[source], len(labels) + 1) if grid[source] else 0
+                     for source in permutation])
+    return ''.join(map(str, min(keys)))
+
+
+@pytest.mark.parametrize('blank_share', [0.3, 0.6, 0.9, 1.0])
+def test_pruned_search_finds_smallest_key(blank_share):
+    rng = random.Random(blank_share)
+    for puzzle_string in hard_puzzle_strings:
+        grid = [0 if rng.random() < blank_share else value for value in symbols_to_grid(puzzle_string)]
+        assert canonicalize(grid, 9).key == get_reference_key(grid, 9)
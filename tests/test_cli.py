@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from models.cli import main
+
+
+def test_bench_help_goes_to_benchmark(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['bench', '--help'])
+    assert exit_info.value.code == 0
+    assert '--repeats' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('argv', [
+    ['bench', '--repeats', '1', '--warmup', '0', '--limit', '5', 'ez1k.txt'],
+    ['bench', 'ez1k.txt', '--limit', '5', '--repeats', '1', '--warmup', '0'],
+    ['--timing', 'bench', '--limit', '5', '--repeats', '1', '--warmup', '0', 'ez1k.txt'],
+])
+def test_bench_options_in_any_position(argv, tmp_path):
+    output = tmp_path / 'bench.json'
+    assert main(argv + ['--output', str(output)]) == 0
+    assert json.loads(output.read_text())
+
+
+def test_other_commands_reject_unknown_options():
+    with pytest.raises(SystemExit) as exit_info:
+        main(['solve', '--repeats', '1', '0' * 81])
+    assert exit_info.value.code == 2
+
+
+def test_solve_prints_final_state(capsys):
+    puzzle_string = '000075400000000008080190000300001060000000034000068170204000603900000020530200000'
+    assert main(['solve', '--quiet', puzzle_string]) == 0
+    solution = capsys.readouterr().out.strip()
+    assert len(solution) == 81 and '0' not in solution
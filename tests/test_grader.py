@@ -0,0 +1,48 @@
+import pytest
+
+from models.grader import Grader
+from models.puzzle import Puzzle
+from models.stats import StatsCollector
+from models.sudoku_solver import SudokuSolver, known_techniques
+
+
+@pytest.fixture(scope='module')
+def grader() -> Grader:
+    return Grader()
+
+
+@pytest.fixture(scope='module')
+def batch_puzzle_strings():
+    return [line.split()[0] for line in open(SudokuSolver.batches_path / '5.txt')][:300]
+
+
+def get_solver_up_to(rank: int) -> SudokuSolver:
+    # Stats keep singles as technique steps, otherwise propagation would place hidden singles without HiddenSingle
+    tech_classes = list(known_techniques.values())[:rank]
+    return SudokuSolver(stats=StatsCollector(), tech_classes=tech_classes)
+
+
+def test_grade_is_smallest_technique_set(grader, batch_puzzle_strings):
+    solvers = [get_solver_up_to(rank) for rank in range(len(known_techniques) + 1)]
+    graded_above_singles = 0
+    for puzzle_string in batch_puzzle_strings:
+        puzzle = Puzzle.from_string(puzzle_string)
+        grade = grader.grade(puzzle)
+        if grade.needs_bruteforce:
+            assert not solvers[-1].solve_logically(puzzle.copy())
+            continue
+
+        graded_above_singles += grade.difficulty > 2
+        assert solvers[grade.difficulty].solve_logically(puzzle.copy())
+        assert grade.difficulty == 0 or not solvers[grade.difficulty - 1].solve_logically(puzzle.copy())
+
+    assert graded_above_singles
+
+
+def test_grade_leaves_puzzle_untouched(grader):
+    puzzle = Puzzle.from_string(
+        '302609005500730000000000900000940000000000109000057060008500006000000003019082040')
+    grid = puzzle.grid[:]
+    grade = grader.grade(puzzle)
+    assert puzzle.grid == grid
+    assert grade.needs_bruteforce and grade.is_solved and grade.branches > 0
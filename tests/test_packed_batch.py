@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from models.encoding import symbols
+from models.packed_batch import PackedBatch, decode_records, encode_record, header_struct, magic, pack_strings, version
+from tests.helpers import hard_puzzle_strings
+
+
+def random_puzzle_string(size: int, rng: random.Random) -> str:
+    return ''.join(rng.choice(symbols[:size + 1]) for _ in range(size * size))
+
+
+@pytest.mark.parametrize('size', [4, 9, 16, 25])
+def test_records_round_trip(size):
+    rng = random.Random(size)
+    puzzle_strings = [random_puzzle_string(size, rng) for _ in range(20)]
+    buffer = b''.join(encode_record(puzzle_string, size) for puzzle_string in puzzle_strings)
+    assert decode_records(buffer, size) == puzzle_strings
+
+
+def test_dots_are_decoded_as_zeros():
+    puzzle_string = hard_puzzle_strings[0].replace('0', '.')
+    assert decode_records(encode_record(puzzle_string, 9), 9) == [hard_puzzle_strings[0]]
+
+
+def test_values_above_size_are_rejected():
+    with pytest.raises(ValueError):
+        encode_record('A' + '0' * 80, 9)
+
+
+def test_file_round_trip(tmp_path):
+    path = tmp_path / 'batch.sdkb'
+    assert pack_strings(hard_puzzle_strings, path) == len(hard_puzzle_strings)
+    with PackedBatch(path) as batch:
+        assert len(batch) == len(hard_puzzle_strings)
+        assert list(batch) == hard_puzzle_strings
+        assert batch[1] == hard_puzzle_strings[1]
+
+
+def test_file_shorter_than_header_is_rejected(tmp_path):
+    path = tmp_path / 'short.sdkb'
+    path.write_bytes(b'SDKB')
+    with pytest.raises(ValueError):
+        PackedBatch(path)
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    path = tmp_path / 'batch.sdkb'
+    pack_strings(hard_puzzle_strings, path)
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        PackedBatch(path)
+
+
+@pytest.mark.parametrize('size, bits_per_cell', [(10, 4), (9, 5), (16, 4), (0, 4)])
+def test_invalid_header_is_rejected(size, bits_per_cell, tmp_path):
+    path = tmp_path / 'batch.sdkb'
+    pack_strings(hard_puzzle_strings, path)
+    data = path.read_bytes()
+    path.write_bytes(header_struct.pack(magic, version, size, bits_per_cell, len(hard_puzzle_strings))
+                     + data[header_struct.size:] + bytes(1000))
+    with pytest.raises(ValueError):
+        PackedBatch(path)
+
+
+def test_empty_batch(tmp_path):
+    path = tmp_path / 'empty.sdkb'
+    assert pack_strings([], path) == 0
+    with PackedBatch(path) as batch:
+        assert len(batch) == 0
+        assert list(batch) == []
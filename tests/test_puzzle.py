@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from models.bitmask import iter_values
+from models.puzzle import Puzzle
+from models.sudoku_solver import SudokuSolver
+from tests.helpers import get_indexes, hard_puzzle_strings, recount_indexes
+
+
+def assign_random_candidates(puzzle: Puzzle, rng: random.Random, steps: int):
+    for _ in range(steps):
+        cells = [cell for cell, cands in enumerate(puzzle.candidates) if not puzzle.grid[cell] and cands]
+        if not cells:
+            return
+        cell = rng.choice(cells)
+        puzzle.assign_value_to_cell(rng.choice(list(iter_values(puzzle.candidates[cell]))), cell)
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_undo_to_restores_state(puzzle_string):
+    puzzle = Puzzle.from_string(puzzle_string)
+    puzzle.start_trail()
+    grid = puzzle.grid[:]
+    candidates = puzzle.candidates[:]
+    indexes = get_indexes(puzzle)
+
+    mark = puzzle.get_trail_mark()
+    assign_random_candidates(puzzle, random.Random(puzzle_string), 10)
+    puzzle.remove_candidate_from_group(5, range(puzzle.geometry.cell_count))
+    assert puzzle.grid != grid
+    puzzle.undo_to(mark)
+
+    assert puzzle.grid == grid
+    assert puzzle.candidates == candidates
+    assert get_indexes(puzzle) == indexes
+
+
+def test_undo_to_keeps_earlier_changes():
+    puzzle = Puzzle.from_string(hard_puzzle_strings[0])
+    puzzle.start_trail()
+    assign_random_candidates(puzzle, random.Random(1), 3)
+    grid = puzzle.grid[:]
+    candidates = puzzle.candidates[:]
+
+    mark = puzzle.get_trail_mark()
+    assign_random_candidates(puzzle, random.Random(2), 3)
+    puzzle.undo_to(mark)
+
+    assert puzzle.grid == grid
+    assert puzzle.candidates == candidates
+    assert get_indexes(puzzle) == recount_indexes(puzzle)
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_indexes_match_recount_after_placements(puzzle_string):
+    puzzle = Puzzle.from_string(puzzle_string)
+    rng = random.Random(puzzle_string)
+    for _ in range(10):
+        assign_random_candidates(puzzle, rng, 1)
+        assert get_indexes(puzzle) == recount_indexes(puzzle)
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_indexes_match_recount_after_techniques(puzzle_string):
+    puzzle = Puzzle.from_string(puzzle_string)
+    solver = SudokuSolver()
+    for tech in solver.tech_classes:
+        technique = tech()
+        while technique.apply(puzzle):
+            assert get_indexes(puzzle) == recount_indexes(puzzle)
+
+
+def test_indexes_from_grid_match_recount():
+    puzzle = Puzzle.from_string(hard_puzzle_strings[2])
+    assert get_indexes(puzzle) == recount_indexes(puzzle)
+
+
+def test_copy_does_not_share_state():
+    puzzle = Puzzle.from_string(hard_puzzle_strings[0])
+    copy = puzzle.copy()
+    assign_random_candidates(copy, random.Random(0), 5)
+    assert get_indexes(puzzle) == recount_indexes(puzzle)
+    assert puzzle.grid != copy.grid
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+import models.solution_cache
+from models.canonical import get_transforms
+from models.encoding import grid_to_symbols
+from models.puzzle import Puzzle
+from models.solution_cache import SolutionCache
+from models.sudoku_solver import SudokuSolver
+from tests.helpers import hard_puzzle_strings
+
+
+def transform_puzzle_string(puzzle_string: str, rng: random.Random) -> str:
+    permutation = rng.choice(get_transforms(9))
+    relabeling = [0] + rng.sample(range(1, 10), 9)
+    return ''.join(str(relabeling[int(puzzle_string[source])]) for source in permutation)
+
+
+@pytest.fixture
+def counted_forms(monkeypatch):
+    calls = []
+    get_form = models.solution_cache.get_form
+
+    def counting_get_form(puzzle):
+        calls.append(puzzle)
+        return get_form(puzzle)
+
+    monkeypatch.setattr(models.solution_cache, 'get_form', counting_get_form)
+    return calls
+
+
+def test_miss_canonicalizes_once(counted_forms):
+    solver = SudokuSolver(cache=SolutionCache())
+    assert solver.solve(Puzzle.from_string(hard_puzzle_strings[0]))
+    assert len(counted_forms) == 1
+    assert solver.cache.misses == 1
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_transformed_puzzle_is_a_hit(puzzle_string):
+    solver = SudokuSolver(cache=SolutionCache())
+    assert solver.solve(Puzzle.from_string(puzzle_string))
+
+    transformed = Puzzle.from_string(transform_puzzle_string(puzzle_string, random.Random(puzzle_string)))
+    expected = transformed.copy()
+    SudokuSolver().solve(expected)
+    assert solver.solve(transformed)
+    assert solver.cache.hits == 1
+    assert transformed.grid == expected.grid
+
+
+def test_exact_repeat_skips_canonicalization(counted_forms):
+    cache = SolutionCache()
+    puzzle = Puzzle.from_string(hard_puzzle_strings[1])
+    solution, form = cache.lookup(puzzle)
+    assert solution is None and form is not None
+    solved = puzzle.copy()
+    SudokuSolver().solve(solved)
+    cache.put(puzzle, solved.grid, form)
+
+    solution, form = cache.lookup(puzzle)
+    assert grid_to_symbols(solution) == solved.get_puzzle_string()
+    assert form is None
+    assert len(counted_forms) == 1
+
+
+def test_persistent_store(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    puzzle = Puzzle.from_string(hard_puzzle_strings[2])
+    with SolutionCache(path=path) as cache:
+        SudokuSolver(cache=cache).solve(puzzle.copy())
+
+    with SolutionCache(path=path) as cache:
+        solved = puzzle.copy()
+        assert SudokuSolver(cache=cache).solve(solved)
+        assert cache.hits == 1
@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+import models.solve_service
+from models.solve_service import SolveService
+from tests.helpers import hard_puzzle_strings
+
+
+def exit_worker(_):
+    # Stands in for `_solve_batch` in a worker that dies, the pool breaks
+    os._exit(1)
+
+
+async def ask(service: SolveService, path: str, lines):
+    async with service:
+        server = await service.start_server(path)
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(''.join(line + '\n' for line in lines).encode())
+            writer.write_eof()
+            answers = [line.decode().split(' ', 2) async for line in reader]
+            writer.close()
+            return answers
+
+
+def test_every_puzzle_gets_a_line(tmp_path):
+    lines = hard_puzzle_strings + ['123']
+    answers = asyncio.run(ask(SolveService(), str(tmp_path / 'solve.sock'), lines))
+
+    assert sorted(puzzle_string for puzzle_string, _, _ in answers) == sorted(lines)
+    by_puzzle = {puzzle_string: (status, detail.strip()) for puzzle_string, status, detail in answers}
+    assert by_puzzle['123'][0] == 'error'
+    for puzzle_string in hard_puzzle_strings:
+        status, detail = by_puzzle[puzzle_string]
+        assert status == 'solved' and '0' not in detail
+
+
+def test_broken_pool_is_answered_with_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(models.solve_service, '_solve_batch', exit_worker)
+    answers = asyncio.run(ask(SolveService(), str(tmp_path / 'solve.sock'), hard_puzzle_strings))
+
+    assert sorted(puzzle_string for puzzle_string, _, _ in answers) == sorted(hard_puzzle_strings)
+    assert all(status == 'error' and detail.strip() for _, status, detail in answers)
+
+
+def test_solve_in_process():
+    async def solve():
+        async with SolveService() as service:
+            return await service.solve(hard_puzzle_strings[0])
+
+    is_solved, puzzle_state = asyncio.run(solve())
+    assert is_solved and '0' not in puzzle_state
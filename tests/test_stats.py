@@ -0,0 +1,62 @@
+import pytest
+
+from models.puzzle import Puzzle
+from models.stats import StatsCollector, TechniqueStats
+from models.sudoku_solver import SudokuSolver
+from tests.helpers import hard_puzzle_strings
+
+
+def get_counts(stats: StatsCollector):
+    return {name: (tech_stats.total_uses, tech_stats.successful_uses, tech_stats.eliminations,
+                   tech_stats.placements, sum(tech_stats.histogram))
+            for name, tech_stats in stats.techniques.items()}
+
+
+def test_percentile_is_bucket_upper_bound():
+    tech_stats = TechniqueStats()
+    for elapsed in [0.5e-6] * 50 + [3e-6] * 40 + [1000e-6] * 10:
+        tech_stats.add(elapsed, True, 0, 0)
+
+    assert tech_stats.percentile_us(50) == 1
+    assert tech_stats.percentile_us(90) == 4
+    assert tech_stats.percentile_us(99) == 1024
+    assert TechniqueStats().percentile_us(50) == 0
+
+
+def test_merge_adds_up():
+    first = StatsCollector(per_puzzle=True)
+    second = StatsCollector(per_puzzle=True)
+    first.record('HiddenSingle', 1e-6, True, 3, 1)
+    second.record('HiddenSingle', 5e-6, False, 0, 0)
+    second.record('Fish', 2e-6, True, 4, 0)
+    second.start_puzzle('0' * 81)
+    second.end_puzzle(False, 0.5)
+
+    first.merge(second)
+    assert get_counts(first) == {'HiddenSingle': (2, 1, 3, 1, 2), 'Fish': (1, 1, 4, 0, 1)}
+    assert first.techniques['HiddenSingle'].total_time == pytest.approx(6e-6)
+    assert [puzzle_stats.total_time for puzzle_stats in first.puzzles] == [0.5]
+
+
+def test_parallel_stats_match_serial():
+    puzzle_strings = [line.split()[0] for line in open(SudokuSolver.batches_path / '5.txt')][:40]
+    serial_solver = SudokuSolver(stats=StatsCollector())
+    parallel_solver = SudokuSolver(stats=StatsCollector())
+    serial_results = serial_solver.solve_many(puzzle_strings)
+    parallel_results = parallel_solver.solve_many(puzzle_strings, workers=2, chunk_size=10)
+
+    assert parallel_results == serial_results
+    assert get_counts(parallel_solver.stats) == get_counts(serial_solver.stats)
+    assert parallel_solver.bruteforce_counter == serial_solver.bruteforce_counter
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_eliminations_match_recount(puzzle_string):
+    puzzle = Puzzle.from_string(puzzle_string)
+    candidate_count = puzzle.count_candidates()
+    stats = StatsCollector()
+    SudokuSolver(stats=stats).solve_logically(puzzle)
+
+    eliminations = sum(tech_stats.eliminations for tech_stats in stats.techniques.values())
+    assert puzzle.removed_count == candidate_count - puzzle.count_candidates()
+    assert eliminations == puzzle.removed_count
@@ -0,0 +1,127 @@
+from itertools import islice
+
+import pytest
+
+from models.exact_cover import ExactCover
+from models.packed_batch import pack_strings
+from models.puzzle import Puzzle
+from models.stats import StatsCollector
+from models.sudoku_solver import SudokuSolver
+from models.tech.single_candidate import SingleCandidate
+from tests.helpers import hard_puzzle_strings
+
+# Generated 16x16 with a unique solution
+puzzle_string_16 = ('20000A10CD40005E0B0A0700000F4D000010000000602008E00D0300070000FG0302F9000B00070D0C0F000B73000'
+                    '40A009000E0G00030000000G000009052000F0B12000000057C070E00A60000010200000BG3D000008F00G4E00F0A210'
+                    '0B00A800100B006F000B020AF003E00000000030890420D00009000000000800601')
+
+
+def count_exact_cover_solutions(puzzle: Puzzle, limit: int) -> int:
+    return sum(1 for _ in islice(ExactCover(puzzle).iter_solutions(), limit))
+
+
+def remove_clues(puzzle_string: str, count: int) -> str:
+    # Blanks the first `count` clues, which usually leaves several solutions
+    result = list(puzzle_string)
+    clues = [i for i, char in enumerate(result) if char != '0']
+    for i in clues[:count]:
+        result[i] = '0'
+    return ''.join(result)
+
+
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings + [remove_clues(s, 4) for s in hard_puzzle_strings])
+@pytest.mark.parametrize('limit', [1, 2, 20])
+def test_count_solutions_agrees_with_exact_cover(puzzle_string, limit):
+    puzzle = Puzzle.from_string(puzzle_string)
+    expected = count_exact_cover_solutions(puzzle, limit)
+    assert SudokuSolver().count_solutions(puzzle, limit) == expected
+
+
+def test_count_solutions_of_empty_grid():
+    puzzle = Puzzle(4)
+    assert SudokuSolver().count_solutions(puzzle, 1000) == count_exact_cover_solutions(puzzle, 1000) == 288
+
+
+def test_count_solutions_without_solution():
+    # Two 1s in the first row
+    puzzle = Puzzle.from_string('11' + '0' * 79)
+    assert SudokuSolver().count_solutions(puzzle) == count_exact_cover_solutions(puzzle, 2) == 0
+
+
+def test_count_solutions_leaves_puzzle_untouched():
+    puzzle = Puzzle.from_string(hard_puzzle_strings[0])
+    grid = puzzle.grid[:]
+    candidates = puzzle.candidates[:]
+    SudokuSolver().count_solutions(puzzle)
+    assert puzzle.grid == grid
+    assert puzzle.candidates == candidates
+
+
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_workers_use_the_given_techniques(packed, tmp_path):
+    puzzle_strings = [line.split()[0] for line in open(SudokuSolver.batches_path / '5.txt')][:40]
+    serial_solver = SudokuSolver(stats=StatsCollector(), tech_classes=(SingleCandidate,))
+    serial_results = serial_solver.solve_many(puzzle_strings)
+
+    parallel_solver = SudokuSolver(stats=StatsCollector(), tech_classes=(SingleCandidate,))
+    if packed:
+        path = tmp_path / 'batch.sdkb'
+        pack_strings(puzzle_strings, path)
+        parallel_results = list(parallel_solver.solve_packed(path, workers=2, chunk_size=10))
+    else:
+        parallel_results = parallel_solver.solve_many(puzzle_strings, workers=2, chunk_size=10)
+
+    assert parallel_results == serial_results
+    assert list(parallel_solver.stats.techniques) == ['SingleCandidate']
+    assert parallel_solver.bruteforce_counter == serial_solver.bruteforce_counter
+
+
+@pytest.mark.parametrize('search_mode', SudokuSolver.search_modes)
+@pytest.mark.parametrize('puzzle_string', hard_puzzle_strings)
+def test_solution_matches_exact_cover(search_mode, puzzle_string):
+    puzzle = Puzzle.from_string(puzzle_string)
+    solution = ExactCover(puzzle).find_solution()
+    assert SudokuSolver(search_mode).solve(puzzle)
+    assert puzzle.grid == solution
+
+
+def test_search_modes_agree_on_16x16():
+    solutions = []
+    for search_mode in SudokuSolver.search_modes:
+        puzzle = Puzzle.from_string(puzzle_string_16)
+        assert SudokuSolver(search_mode).solve(puzzle)
+        assert puzzle.validate_solution()
+        solutions.append(puzzle.grid)
+
+    assert all(value in (0, solved) for value, solved in zip(Puzzle.from_string(puzzle_string_16).grid, solutions[0]))
+    assert solutions.count(solutions[0]) == len(solutions)
+
+
+def test_vectorized_stream_takes_size_from_first_string():
+    pytest.importorskip('numpy')
+    puzzle_strings = [puzzle_string_16, remove_clues(puzzle_string_16, 10)]
+    expected = [SudokuSolver().solve_string(puzzle_string) for puzzle_string in puzzle_strings]
+    assert list(SudokuSolver().solve_stream(puzzle_strings, vectorized=True)) == expected
+    assert list(SudokuSolver().solve_stream([], vectorized=True)) == []
+
+
+@pytest.mark.parametrize('puzzle_string', [remove_clues(s, 6) for s in hard_puzzle_strings])
+def test_exact_cover_branching_counts_every_solution(puzzle_string):
+    puzzle = Puzzle.from_string(puzzle_string)
+    assert SudokuSolver('dlx').count_solutions(puzzle, 50) == count_exact_cover_solutions(puzzle, 50)
+
+
+@pytest.mark.parametrize('puzzle_string', [remove_clues(s, 6) for s in hard_puzzle_strings])
+def test_value_with_fewest_places(puzzle_string):
+    # Logical techniques first, so that no hidden single is left and two places is the fewest possible
+    puzzle = Puzzle.from_string(puzzle_string)
+    SudokuSolver().solve_logically(puzzle)
+    unit_masks = puzzle.geometry.unit_masks
+    counts = [places.bit_count() for places in (digit_cells & unit_mask for digit_cells in puzzle.digit_cells
+                                                for unit_mask in unit_masks) if places]
+    value, cells = puzzle.find_value_with_fewest_places(puzzle.size + 1)
+    assert cells.bit_count() == min(counts)
+    assert any(puzzle.digit_cells[value - 1] & unit_mask == cells for unit_mask in unit_masks)
+    assert puzzle.find_value_with_fewest_places(min(counts)) == (0, 0)